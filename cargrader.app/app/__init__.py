@@ -11,6 +11,8 @@ from .routes.auth import auth_bp, init_auth  # includes init_auth()
 
 from .routes.billing import billing_bp
 from .utils.access import ensure_pass_tables, has_active_pass_for_session
+from .utils.cache import init_cache
+from .db.plans import verify_catalog as verify_catalog_plans
 
 load_dotenv()  # load environment vars once when module imports
 
@@ -27,9 +29,13 @@ def create_app(config_object="config.Config"):
     # Initialize Auth0 client on the shared OAuth instance
     init_auth(app)
 
-    # Ensure DB has the Passes table
+    # Shared (cross-worker) cache tier, if configured
+    init_cache(app)
+
+    # Ensure DB has the Passes table; check the catalog's query plans
     with app.app_context():
         ensure_pass_tables()
+        verify_catalog_plans()
 
     # Make has_active_pass and user authentication status available in Jinja templates
     @app.context_processor
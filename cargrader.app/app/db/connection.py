@@ -1,21 +1,310 @@
+import os
 import sqlite3
-from flask import current_app
+import threading
+from flask import current_app, g, has_app_context
 from contextlib import contextmanager
+from urllib.parse import quote
+from app.utils import singleflight
 
 def _row_factory(cursor, row):
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
+def _file_identity(db_path):
+    """(inode, mtime, size) of the file, or None if it is missing."""
+    try:
+        st = os.stat(db_path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _connect_readonly(db_path, immutable=False, mmap_size=0, cache_size_kb=0):
+    if not os.path.exists(db_path):
+        # mode=ro would raise a vague "unable to open database file"
+        raise sqlite3.OperationalError(f"database file not found: {db_path}")
+    mode = "mode=ro&immutable=1" if immutable else "mode=ro"
+    con = sqlite3.connect(f"file:{quote(db_path)}?{mode}", uri=True, check_same_thread=False)
+    con.row_factory = _row_factory
+    con.execute("PRAGMA query_only = ON;")
+    if mmap_size:
+        con.execute(f"PRAGMA mmap_size = {mmap_size};")
+    if cache_size_kb:
+        # negative cache_size is a size in KiB rather than pages
+        con.execute(f"PRAGMA cache_size = -{cache_size_kb};")
+    return con
+
+
+class ReadPool:
+    """
+    Long-lived read-only connections to a single SQLite file.
+
+    Each connection is used by one caller at a time and handed back to a LIFO
+    stack, so the most recently used (warmest) connection is reused first.
+    At most `size` connections are kept; extra concurrent callers get a
+    one-off connection that is closed on return instead of waiting.
+
+    The pool remembers the file's (inode, mtime, size). When the file is
+    replaced on disk the pool drains itself: idle connections are closed and
+    connections still checked out are closed when they come back.
+    """
+
+    def __init__(self, db_path, size=8, mmap_size=0, cache_size_kb=0, immutable=False):
+        self.db_path = os.path.abspath(db_path)
+        self.size = max(1, int(size))
+        self.mmap_size = int(mmap_size)
+        self.cache_size_kb = int(cache_size_kb)
+        self.immutable = immutable
+        self.catalog = False     # a catalog version (see get_pool)
+
+        self._lock = threading.Lock()
+        self._idle = []          # [(generation, con)]
+        self._open = 0           # pooled connections (idle + checked out)
+        self._generation = 0
+        self._identity = _file_identity(self.db_path)
+        self.stats = {"opened": 0, "reused": 0, "overflow": 0, "drains": 0}
+
+    def _connect(self):
+        return _connect_readonly(self.db_path, self.immutable, self.mmap_size, self.cache_size_kb)
+
+    def _drain_locked(self):
+        self._generation += 1
+        self._identity = _file_identity(self.db_path)
+        idle, self._idle = self._idle, []
+        # connections of the old generation are no longer counted
+        self._open = 0
+        self.stats["drains"] += 1
+        return idle
+
+    def drain(self):
+        """Close idle connections; checked-out ones are closed on return."""
+        with self._lock:
+            idle = self._drain_locked()
+        for _, con in idle:
+            con.close()
+
+    def checkout(self):
+        """Return (generation, con); generation is None for overflow connections."""
+        stale = []
+        with self._lock:
+            if _file_identity(self.db_path) != self._identity:
+                stale = self._drain_locked()
+            if self._idle:
+                gen, con = self._idle.pop()
+                self.stats["reused"] += 1
+            elif self._open < self.size:
+                self._open += 1
+                gen, con = self._generation, None
+            else:
+                gen, con = None, None
+                self.stats["overflow"] += 1
+        for _, old in stale:
+            old.close()
+
+        if con is None:
+            try:
+                con = self._connect()
+            except Exception:
+                if gen is not None:
+                    with self._lock:
+                        if gen == self._generation:
+                            self._open -= 1
+                raise
+            with self._lock:
+                self.stats["opened"] += 1
+        return gen, con
+
+    def checkin(self, gen, con, discard=False):
+        if con.in_transaction:
+            con.rollback()
+        with self._lock:
+            if gen is not None and gen == self._generation:
+                if not discard:
+                    self._idle.append((gen, con))
+                    return
+                self._open -= 1
+        con.close()
+
+    def close(self):
+        self.drain()
+
+    def info(self):
+        with self._lock:
+            return {
+                "db_path": self.db_path,
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "generation": self._generation,
+                **self.stats,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def catalog_path():
+    """
+    The catalog file DB_PATH currently resolves to (it may be a symlink into
+    a versions/ directory, see app.db.swap). Pinned in flask.g on first use,
+    so a request keeps reading one version even if a swap lands mid-request.
+    """
+    if has_app_context() and "catalog_path" in g:
+        return g.catalog_path
+    path = os.path.realpath(current_app.config["DB_PATH"])
+    if has_app_context():
+        g.catalog_path = path
+    return path
+
+def _pool_options():
+    cfg = current_app.config
+    return {
+        "mmap_size": cfg.get("DB_MMAP_SIZE", 0),
+        "cache_size_kb": cfg.get("DB_CACHE_SIZE_KB", 0),
+        "immutable": cfg.get("DB_IMMUTABLE", False),
+    }
+
+def _drop_stale_catalog_pools(current):
+    """Forget pools of catalog versions other than current (swapped out, maybe by another worker)."""
+    stale = [p for path, p in list(_pools.items()) if p.catalog and path != current]
+    if not stale:
+        return
+    with _pools_lock:
+        for p in stale:
+            if _pools.get(p.db_path) is p:
+                del _pools[p.db_path]
+    for p in stale:
+        p.drain()
+
+def get_pool(db_path=None):
+    """
+    The process-wide ReadPool for db_path (defaults to the catalog, see
+    catalog_path). Only the catalog version DB_PATH points at right now is
+    pooled: for an older version a request is still pinned to, this returns
+    None and pooled_conn opens a one-off connection. Every catalog checkout
+    also drops pools left on older versions, so each worker releases swapped-
+    out (and pruned) files on its next request rather than only the worker
+    that took the upload.
+    """
+    cfg = current_app.config
+    db_path = os.path.abspath(db_path) if db_path else catalog_path()
+    catalog = db_path == catalog_path()
+    if catalog:
+        current = os.path.realpath(cfg["DB_PATH"])
+        _drop_stale_catalog_pools(current)
+        if db_path != current:
+            return None
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db_path)
+            if pool is None:
+                pool = ReadPool(db_path, size=cfg.get("DB_POOL_SIZE", 8), **_pool_options())
+                pool.catalog = catalog
+                _pools[db_path] = pool
+    return pool
+
+def drain_pools(retire=()):
+    """
+    Drain every pool, e.g. after GraderRater.db has been swapped. Pools for
+    the paths in retire (old catalog versions) are also forgotten. Other
+    workers drop theirs on their next catalog checkout (see get_pool).
+    """
+    retire = {os.path.abspath(p) for p in retire}
+    with _pools_lock:
+        pools = list(_pools.values())
+        for path in retire:
+            _pools.pop(path, None)
+    for pool in pools:
+        pool.drain()
+
+def db_version(db_path=None):
+    """Token identifying the catalog file currently on disk; changes when it is replaced."""
+    db_path = os.path.abspath(db_path) if db_path else catalog_path()
+    return (db_path,) + (_file_identity(db_path) or ())
+
+def per_db_version(build):
+    """
+    Memoize a zero-argument builder until the catalog DB changes.
+    Used for in-memory structures derived from AllCars (catalog, indexes);
+    they live in the versioned "derived" namespace of app.utils.cache.
+    """
+    from app.utils import cache
+    return cache.memoize("derived", max_entries=None)(build)
+
+@contextmanager
+def pooled_conn(db_path=None):
+    """A read-only connection from the pool for db_path (default: the catalog DB)."""
+    pool = get_pool(db_path)
+    if pool is None:
+        # a catalog version that is no longer current: not pooled
+        db_path = os.path.abspath(db_path) if db_path else catalog_path()
+        con = _connect_readonly(db_path, **_pool_options())
+        try:
+            yield con
+        finally:
+            con.close()
+        return
+    gen, con = pool.checkout()
+    discard = False
+    try:
+        yield con
+    except sqlite3.Error:
+        discard = True
+        raise
+    finally:
+        pool.checkin(gen, con, discard=discard)
+
+_flights = singleflight.group("db")
+
+def _params_key(params):
+    if isinstance(params, dict):
+        return tuple(sorted(params.items()))
+    return tuple(params)
+
+def _query_all(db_path, sql, params):
+    with pooled_conn(db_path) as con:
+        return con.execute(sql, params).fetchall()
+
+def query_all(sql, params=(), db_path=None) -> list:
+    """
+    fetchall() of a read-only query on the pool. Identical queries running at
+    the same moment share one execution, so callers must not mutate the rows.
+    """
+    version = db_version(db_path)
+    return _flights.do((version, sql, _params_key(params)), _query_all, version[0], sql, params)
+
+def coalesce(key, fn, *args, **kwargs):
+    """Run fn once for concurrent callers with the same key (see app.utils.singleflight)."""
+    return _flights.do(key, fn, *args, **kwargs)
+
 @contextmanager
 def get_conn(readonly=False):
-    db_path = current_app.config["DB_PATH"]
-    con = sqlite3.connect(db_path, check_same_thread=False)
-    con.row_factory = _row_factory
+    """
+    Catalog DB connection. The catalog is read-only: readonly=True hands out a
+    pooled connection, otherwise a one-off mode=ro connection. Pass data lives
+    in its own file, see passes_conn().
+    """
     if readonly:
-        try:
-            con.execute("PRAGMA query_only = ON;")
-        except Exception:
-            pass
+        with pooled_conn() as con:
+            yield con
+        return
+
+    db_path = catalog_path()
+    con = sqlite3.connect(f"file:{quote(db_path)}?mode=ro", uri=True, check_same_thread=False)
+    con.row_factory = _row_factory
+    try:
+        yield con
+    finally:
+        con.close()
+
+@contextmanager
+def passes_conn():
+    """Read-write connection to the Passes store (PASSES_DB_PATH; WAL, see ensure_pass_tables)."""
+    db_path = current_app.config["PASSES_DB_PATH"]
+    con = sqlite3.connect(db_path, timeout=5.0, check_same_thread=False)
+    con.row_factory = _row_factory
     try:
+        con.execute("PRAGMA synchronous = NORMAL;")
         yield con
     finally:
         con.close()
@@ -0,0 +1,114 @@
+# EXPLAIN QUERY PLAN checks for the hot catalog queries (queries.PLANNED_QUERIES).
+#
+# A catalog without the right index turns every filter request into a full
+# scan of AllCars. Plans are checked at boot and for every uploaded catalog
+# (app.db.swap); QUERY_PLAN_POLICY decides what happens to a full scan:
+#   warn    log it (uploads also report it in the response)
+#   reject  refuse the upload; refuse to boot
+#   off     skip the check
+# `python -m app.tools.provision_indexes` creates the indexes that fix it.
+import os
+import re
+import sqlite3
+from urllib.parse import quote
+from flask import current_app
+from app.db import queries
+
+# Queries that read the whole table on purpose (built once per DB version).
+BULK_QUERIES = {"catalog", "vehicles"}
+
+# Queries that need columns only normalized catalogs have; without them the
+# route falls back to the legacy form and the check leaves them out.
+NEEDS_COLUMNS = {"grade": queries.GRADE_COLUMNS}
+
+# Indexes that give every planned query an index search; created by the tool.
+INDEXES = {
+    "idx_allcars_ymms": "CREATE INDEX IF NOT EXISTS idx_allcars_ymms ON AllCars(ModelYear, Make, Model, Score)",
+}
+
+# Indexes over normalized columns: (columns they need, DDL).
+COLUMN_INDEXES = {
+    "idx_allcars_keys": (
+        ("MakeKey", "ModelKey"),
+        "CREATE INDEX IF NOT EXISTS idx_allcars_keys ON AllCars(MakeKey, ModelKey, ModelYear, Score)",
+    ),
+}
+
+# "SCAN AllCars" / "SCAN TABLE AllCars" without "USING ... INDEX"
+_FULL_SCAN = re.compile(r"^SCAN (TABLE )?(?P<table>\w+)(?: AS \w+)?$")
+
+
+class PlanRejected(Exception):
+    pass
+
+
+def _dummy_params(sql: str) -> dict:
+    return {n: 0 for n in re.findall(r":(\w+)", sql)}
+
+def explain(con, sql: str) -> list:
+    rows = con.execute("EXPLAIN QUERY PLAN " + sql, _dummy_params(sql)).fetchall()
+    return [r[3] if isinstance(r, tuple) else r["detail"] for r in rows]
+
+def full_scans(plan: list) -> list:
+    """Tables the plan reads front to back without an index."""
+    out = []
+    for line in plan:
+        m = _FULL_SCAN.match(line.strip())
+        if m:
+            out.append(m.group("table"))
+    return out
+
+def _allcars_columns(con) -> set:
+    return {r[0] for r in con.execute(queries.ALLCARS_COLUMNS_SQL).fetchall()}
+
+def column_indexes(con) -> dict:
+    """{name: ddl} of the COLUMN_INDEXES this catalog's AllCars has the columns for."""
+    columns = _allcars_columns(con)
+    return {name: ddl for name, (needs, ddl) in COLUMN_INDEXES.items() if columns.issuperset(needs)}
+
+def all_indexes(con) -> dict:
+    """{name: ddl} of every index the planned queries want on this catalog."""
+    return {**INDEXES, **column_indexes(con)}
+
+def check(con) -> dict:
+    """{name: {"plan": [...], "full_scan": [tables], "bulk": bool}} for every planned query."""
+    columns = _allcars_columns(con)
+    report = {}
+    for name, sql in queries.PLANNED_QUERIES.items():
+        if not columns.issuperset(NEEDS_COLUMNS.get(name, ())):
+            continue
+        plan = explain(con, sql)
+        report[name] = {"plan": plan, "full_scan": full_scans(plan), "bulk": name in BULK_QUERIES}
+    return report
+
+def problems(report: dict) -> list:
+    return [f"{name}: full scan of {', '.join(r['full_scan'])}"
+            for name, r in report.items() if r["full_scan"] and not r["bulk"]]
+
+def enforce(report: dict, source: str, policy: str = None) -> list:
+    """Apply QUERY_PLAN_POLICY to a report; returns the problems, raises PlanRejected on reject."""
+    policy = policy or current_app.config.get("QUERY_PLAN_POLICY", "warn")
+    found = problems(report)
+    if found and policy == "reject":
+        raise PlanRejected(f"{source}: " + "; ".join(found))
+    for p in found:
+        current_app.logger.warning("query plan (%s): %s", source, p)
+    return found
+
+def verify_catalog():
+    """Boot-time check of the catalog DB currently at DB_PATH."""
+    policy = current_app.config.get("QUERY_PLAN_POLICY", "warn")
+    path = os.path.realpath(current_app.config["DB_PATH"])
+    if policy == "off" or not os.path.exists(path):
+        return []
+    con = sqlite3.connect(f"file:{quote(path)}?mode=ro", uri=True)
+    try:
+        report = check(con)
+    except sqlite3.Error as e:
+        current_app.logger.error("query plan check of %s failed: %s", path, e)
+        if policy == "reject":
+            raise PlanRejected(f"{path}: {e}")
+        return []
+    finally:
+        con.close()
+    return enforce(report, path, policy)
@@ -1,48 +1,61 @@
-YEARS_SQL = """
-SELECT DISTINCT ModelYear
+# Every (year, make, model) in one ordered pass; app.services.catalog builds
+# the dropdown tree from this once per DB version.
+CATALOG_SQL = """
+SELECT DISTINCT ModelYear, Make, Model
 FROM AllCars
 WHERE ModelYear IS NOT NULL
-ORDER BY ModelYear
+ORDER BY ModelYear, Make, Model
 """
 
-MAKES_SQL = """
-SELECT DISTINCT Make
+# All rows, best-scored row first within each (year, make, model); the
+# vehicle index in app.services.vehicles keeps that first row per vehicle.
+VEHICLES_SQL = """
+SELECT ModelYear, Make, Model, GroupID, Score, Certainty, RelRatio, Count
 FROM AllCars
-WHERE ModelYear = :year
-ORDER BY Make
+WHERE ModelYear IS NOT NULL
+ORDER BY ModelYear, Make, Model, (Score IS NULL), Score DESC
 """
 
-MODELS_SQL = """
-SELECT DISTINCT Model
-FROM AllCars
-WHERE ModelYear = :year AND Make = :make
-ORDER BY Model
+# Pre-aggregated form of the above, one row per vehicle, written by
+# app.tools.optimize_catalog (same first-row / SUM(Count) rules).
+HAS_VEHICLE_SUMMARY_SQL = """
+SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'VehicleSummary'
+"""
+
+VEHICLE_SUMMARY_SQL = """
+SELECT ModelYear, Make, Model, GroupID, Score, Certainty, RelRatio, ComplaintCount
+FROM VehicleSummary
 """
 
-SCORE_SQL = """
-SELECT Score, Certainty, GroupID
+# /api/grade: Score & Certainty rounded to 1 decimal for one Y/M/M. GRADE_SQL
+# needs the GRADE_COLUMNS added by app.tools.normalize_catalog and is a seek on
+# idx_allcars_keys, matching make/model by catalog.name_key (case and spacing
+# ignored); GRADE_LEGACY_SQL serves catalogs that still store ModelYear as text.
+# A Y/M/M can have several rows; both serve the best score. Score DESC already
+# sorts NULLs last, the same order as (Score IS NULL), Score DESC, and lets
+# GRADE_SQL walk the index backwards instead of sorting.
+GRADE_COLUMNS = ("MakeKey", "ModelKey", "Graded")
+
+GRADE_SQL = """
+SELECT ROUND(Score, 1) AS ScoreRounded, ROUND(Certainty, 1) AS CertaintyRounded
 FROM AllCars
-WHERE ModelYear = :year AND Make = :make AND Model = :model
-ORDER BY (Score IS NULL), Score DESC
+WHERE MakeKey = :make_key AND ModelKey = :model_key AND ModelYear = :year AND Graded = 1
+ORDER BY Score DESC
 LIMIT 1
 """
-DETAILS_SQL = """
-SELECT
-  ac.ModelYear      AS ModelYear,
-  ac.Make           AS Make,
-  ac.Model          AS Model,
-  ac.GroupID        AS GroupID,
-  SUM(ac.Count)    AS ComplaintCount,
-  ac.RelRatio       AS RelRatio
-FROM AllCars ac
-WHERE ac.ModelYear = :year
-  AND ac.Make      = :make
-  AND ac.Model     = :model
-GROUP BY ac.GroupID, ac.ModelYear, ac.Make, ac.Model, ac.RelRatio
-ORDER BY (ac.Score IS NULL), ac.Score DESC
+
+GRADE_LEGACY_SQL = """
+SELECT ROUND(Score, 1) AS ScoreRounded, ROUND(Certainty, 1) AS CertaintyRounded
+FROM AllCars
+WHERE CAST(TRIM(ModelYear) AS INTEGER) = :year
+  AND Make = :make AND Model = :model
+  AND Score IS NOT NULL AND Certainty IS NOT NULL
+ORDER BY Score DESC
 LIMIT 1
 """
 
+ALLCARS_COLUMNS_SQL = "SELECT name FROM pragma_table_info('AllCars')"
+
 # ---- Filtered Lookup SQL ----
 
 FILTER_MAKES_RANGE_SQL = """
@@ -74,8 +87,72 @@ WHERE ModelYear BETWEEN :min_year AND :max_year
   {models_clause}
   {score_clause}
 GROUP BY ModelYear, Make, Model
+{after_clause}
 ORDER BY (MAX(Score) IS NULL), MAX(Score) DESC, Year DESC, Make ASC, Model ASC
 LIMIT :limit
 """
 
+# Keyset pagination: only groups sorting strictly after the previous page's
+# last row on the ORDER BY key above. NULL-safe (IS) so NULL scores and names
+# page like SQLite sorts them.
+FILTER_SEARCH_AFTER_CLAUSE = """
+HAVING (:after_score IS NOT NULL AND (MAX(Score) IS NULL OR MAX(Score) < :after_score))
+    OR (MAX(Score) IS :after_score AND (
+          ModelYear < :after_year
+          OR (ModelYear = :after_year AND (
+                Make > :after_make OR (:after_make IS NULL AND Make IS NOT NULL)
+                OR (Make IS :after_make AND (
+                      Model > :after_model OR (:after_model IS NULL AND Model IS NOT NULL)))))))
+"""
+
+# /api/filter/facets without the facet index: every matching vehicle with its
+# MAX(Score); the route counts buckets/makes/years from these rows.
+FILTER_FACETS_SQL_BASE = """
+SELECT
+  ModelYear AS Year,
+  Make,
+  MAX(Score) AS Score
+FROM AllCars
+WHERE ModelYear BETWEEN :min_year AND :max_year
+  {makes_clause}
+  {models_clause}
+  {score_clause}
+GROUP BY ModelYear, Make, Model
+"""
+
+
+
+# Rows behind the columnar filter snapshot (app.services.snapshot).
+SNAPSHOT_SQL = """
+SELECT ModelYear, Make, Model, Score
+FROM AllCars
+WHERE ModelYear IS NOT NULL
+"""
+
+# ---- Catalog validation ----
+
+# Columns the app reads from AllCars; a catalog upload without them is rejected.
+ALLCARS_REQUIRED_COLUMNS = (
+    "ModelYear", "Make", "Model", "GroupID", "Score", "Certainty", "RelRatio", "Count",
+)
 
+# The hot queries, with the route-formatted clauses filled in, for
+# EXPLAIN QUERY PLAN checks against a candidate or live catalog file.
+PLANNED_QUERIES = {
+    "catalog": CATALOG_SQL,
+    "vehicles": VEHICLES_SQL,
+    "grade": GRADE_SQL,
+    "filter_makes": FILTER_MAKES_RANGE_SQL,
+    "filter_models": FILTER_MODELS_RANGE_SQL_BASE.format(makes_clause="AND Make IN (:m0)"),
+    "filter_search": FILTER_SEARCH_SQL_BASE.format(
+        makes_clause="AND Make IN (:m0)",
+        models_clause="",
+        score_clause="AND Score >= :min_score",
+        after_clause="",
+    ),
+    "filter_facets": FILTER_FACETS_SQL_BASE.format(
+        makes_clause="AND Make IN (:m0)",
+        models_clause="",
+        score_clause="AND Score >= :min_score",
+    ),
+}
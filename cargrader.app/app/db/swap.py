@@ -0,0 +1,176 @@
+# Publishing a new catalog DB while the app is serving.
+#
+#   1. stream_to_file   upload -> temp file in CATALOG_VERSIONS_DIR, sha256 on the way
+#   2. validate         schema + query plans checked on the temp file, offline
+#   3. publish          temp file -> versions/<stem>-<time>-<sha>-<rand>.db, then DB_PATH is
+#                       atomically re-pointed at it (a relative symlink)
+#   4. drain the pools and bump the cache generation
+#
+# Version files are never modified once published and the previous ones are
+# kept (CATALOG_KEEP_VERSIONS, each for at least CATALOG_PRUNE_GRACE seconds
+# after it was replaced), so a request that pinned the old file (see
+# app.db.connection.catalog_path), on any worker, finishes on it unchanged.
+import os
+import time
+import hashlib
+import secrets
+import sqlite3
+import tempfile
+import datetime as dt
+from urllib.parse import quote
+from flask import current_app, g
+from app.db import plans
+from app.db import queries
+from app.db.connection import catalog_path, drain_pools
+from app.utils import cache
+
+CHUNK_BYTES = 1024 * 1024
+
+
+class CatalogRejected(Exception):
+    """The uploaded file is not a usable catalog; nothing was published."""
+    pass
+
+
+def versions_dir() -> str:
+    cfg = current_app.config
+    return cfg.get("CATALOG_VERSIONS_DIR") or os.path.join(
+        os.path.dirname(os.path.abspath(cfg["DB_PATH"])), "versions")
+
+def stream_to_file(stream, directory: str):
+    """Copy a file-like stream into a new temp file in directory; (path, size, sha256 hex)."""
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".db")
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = stream.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return tmp, size, sha.hexdigest()
+
+def validate(path: str, integrity: bool = True) -> dict:
+    """
+    Open path read-only and check it can serve the app: integrity, the AllCars
+    columns, at least one row, and the plans of the hot queries (app.db.plans).
+    Returns the plan report; raises CatalogRejected.
+    """
+    try:
+        con = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        raise CatalogRejected(f"cannot open upload: {e}")
+    try:
+        if integrity:
+            (ok,) = con.execute("PRAGMA quick_check").fetchone()
+            if ok != "ok":
+                raise CatalogRejected(f"quick_check: {ok}")
+        cols = {r[1] for r in con.execute("PRAGMA table_info(AllCars)")}
+        if not cols:
+            raise CatalogRejected("no AllCars table")
+        missing = [c for c in queries.ALLCARS_REQUIRED_COLUMNS if c not in cols]
+        if missing:
+            raise CatalogRejected(f"AllCars is missing columns: {', '.join(missing)}")
+        if con.execute("SELECT 1 FROM AllCars WHERE ModelYear IS NOT NULL LIMIT 1").fetchone() is None:
+            raise CatalogRejected("AllCars has no rows")
+        report = plans.check(con)
+    except sqlite3.DatabaseError as e:
+        raise CatalogRejected(f"not a usable SQLite catalog: {e}")
+    finally:
+        con.close()
+    try:
+        plans.enforce(report, "upload")
+    except plans.PlanRejected as e:
+        raise CatalogRejected(f"{e} (run python -m app.tools.provision_indexes on it first)")
+    return report
+
+def publish(tmp_path: str, sha256: str) -> dict:
+    """Move a validated temp file into place and point DB_PATH at it."""
+    db_path = os.path.abspath(current_app.config["DB_PATH"])
+    vdir = versions_dir()
+    previous = os.path.realpath(db_path) if os.path.exists(db_path) else None
+    retired = [previous] if previous else []
+
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    stamp = dt.datetime.now(dt.timezone.utc).strftime("%Y%m%dT%H%M%S")
+    # the random suffix keeps a re-upload of the same file within the same
+    # second from landing on (and replacing) the live version
+    final = os.path.join(vdir, f"{stem}-{stamp}-{sha256[:12]}-{secrets.token_hex(3)}.db")
+    os.replace(tmp_path, final)
+    os.utime(final)  # a version's mtime is when it went live (see _prune)
+
+    if previous and not os.path.islink(db_path) and os.path.dirname(previous) != vdir:
+        # first swap: keep the original plain file as a version too
+        kept = os.path.join(vdir, f"{stem}-original-{int(os.path.getmtime(previous))}.db")
+        try:
+            os.link(previous, kept)
+            previous = kept
+        except OSError:
+            current_app.logger.warning("could not keep %s as a version", previous)
+
+    link_tmp = f"{db_path}.{os.getpid()}.swap"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    os.symlink(os.path.relpath(final, os.path.dirname(db_path)), link_tmp)
+    os.replace(link_tmp, db_path)
+
+    # Requests already running keep their pinned file; new ones see the new one.
+    drain_pools(retire=retired)
+    cache.bump()
+    g.pop("catalog_path", None)
+    g.pop("data_version", None)
+
+    removed = _prune(vdir, keep={final, previous})
+    return {"path": final, "previous": previous, "removed": removed}
+
+def _prune(vdir: str, keep) -> list:
+    """
+    Delete versions beyond the newest CATALOG_KEEP_VERSIONS. A version was
+    replaced when the next newer one went live (that one's mtime); until
+    CATALOG_PRUNE_GRACE has passed since, other workers may still be
+    finishing requests pinned to it, so it stays.
+    """
+    limit = max(2, int(current_app.config.get("CATALOG_KEEP_VERSIONS", 3)))
+    grace = float(current_app.config.get("CATALOG_PRUNE_GRACE", 600))
+    versions = sorted(
+        ((os.path.getmtime(p), p) for p in
+         (os.path.join(vdir, n) for n in os.listdir(vdir) if n.endswith(".db") and not n.startswith("."))),
+        reverse=True,
+    )
+    now = time.time()
+    removed = []
+    for i in range(limit, len(versions)):
+        path = versions[i][1]
+        replaced_at = versions[i - 1][0]
+        if path in keep or now - replaced_at < grace:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue  # pruned by another worker
+        removed.append(path)
+    return removed
+
+def swap_from_stream(stream, expected_sha256: str = None) -> dict:
+    """The whole pipeline; the temp file is removed if anything before publish fails."""
+    tmp, size, sha = stream_to_file(stream, versions_dir())
+    try:
+        if expected_sha256 and expected_sha256.lower() != sha:
+            raise CatalogRejected(f"sha256 mismatch: got {sha}")
+        report = validate(tmp, integrity=current_app.config.get("CATALOG_INTEGRITY_CHECK", True))
+    except BaseException:
+        os.remove(tmp)
+        raise
+    result = publish(tmp, sha)
+    current_app.logger.info("published catalog %s (%d bytes, sha256 %s)", result["path"], size, sha)
+    return {"size": size, "sha256": sha, "plans": report, "plan_warnings": plans.problems(report),
+            **result, "catalog_path": catalog_path()}
@@ -1,9 +1,64 @@
-from flask import Blueprint, jsonify, request, current_app
+import hmac
+from functools import wraps
+from flask import Blueprint, jsonify, request, current_app, abort
+from app.utils import cache
+from app.utils import singleflight
 
 admin_bp = Blueprint("admin", __name__)
 
+def requires_token(view):
+    """Authorization: Bearer <UPLOAD_TOKEN>; the route does not exist while the token is unset."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get("UPLOAD_TOKEN")
+        if not token:
+            abort(404)
+        if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()):
+            abort(401)
+        return view(*args, **kwargs)
+    return wrapper
+
 @admin_bp.post("/upload-db")
+@requires_token
 def upload_db():
-    # Placeholder for your existing admin upload endpoint
-    # Keep your auth check here if you had one before
-    return jsonify(ok=True, msg="Wire up your file handling here.")
+    """
+    Publish a new catalog DB without downtime (see app.db.swap).
+    Body: the raw .db file (application/octet-stream), or multipart form-data
+    with file=@GraderRater.db. Optional header X-Content-SHA256 is verified.
+    """
+    from app.db import swap
+    from app.services.catalog import get_catalog
+    from app.services.vehicles import get_index
+
+    if request.mimetype == "multipart/form-data":
+        file = request.files.get("file")
+        if not file or not file.filename.lower().endswith(".db"):
+            return jsonify(ok=False, error="upload a .db file"), 400
+        stream = file.stream
+    else:
+        stream = request.stream
+    try:
+        result = swap.swap_from_stream(stream, request.headers.get("X-Content-SHA256"))
+    except swap.CatalogRejected as e:
+        return jsonify(ok=False, error=str(e)), 422
+
+    # build this worker's derived structures now rather than on the next request
+    get_catalog()
+    get_index()
+    return jsonify(ok=True, **result)
+
+@admin_bp.get("/cache-stats")
+@requires_token
+def cache_stats():
+    """Per-namespace entries, bytes, hit rate and eviction counters for this worker."""
+    from app.services import r2
+    return jsonify(ok=True, cache=cache.stats(), r2=r2.cache_stats(), in_flight=singleflight.stats())
+
+@admin_bp.post("/cache/clear")
+@requires_token
+def cache_clear():
+    """Drop this worker's in-process caches; ?versioned=1 also invalidates the shared tier."""
+    if request.args.get("versioned", type=int):
+        cache.bump()
+    cache.clear_all()
+    return jsonify(ok=True)
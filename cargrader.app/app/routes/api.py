@@ -1,8 +1,23 @@
 import os
-from flask import Blueprint, jsonify, request, current_app
-from app.db.connection import get_conn
+import io
+import csv
+import json
+import math
+import base64
+from flask import Blueprint, jsonify, request, current_app, stream_with_context
+from app.db.connection import get_conn, get_pool, query_all
 from app.db import queries
-from app.utils.access import requires_pass
+from app.utils.access import requires_pass, has_active_pass_for_session
+from app.utils import cache
+from app.utils import singleflight
+from app.services.catalog import get_catalog, allcars_columns, name_key
+from app.services.vehicles import resolve, get_index, vehicles_by_group
+from app.services import artifacts
+from app.services import artifact_store
+from app.services import snapshot
+from app.services import facets
+from app.services import year_index
+from app.services import vehicle_search
 
 api_bp = Blueprint("api", __name__)
 
@@ -46,6 +61,9 @@ def health():
             """).fetchone()
             info["years_count"] = y["c"] if y else 0
             info["ok"] = True
+        pool = get_pool()
+        info["pool"] = pool.info() if pool is not None else None
+        info["in_flight"] = singleflight.stats()
 
     except Exception as e:
         info["error"] = f"health failed: {e}"
@@ -57,15 +75,17 @@ def health():
 # Year/Make/Model primitives
 # ----------------------------
 
+def _json_bytes(body: bytes, status=200):
+    """Response for a body that is already serialized JSON."""
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
 @api_bp.get("/years")
 def years():
     try:
-        with get_conn(readonly=True) as con:
-            rows = con.execute(queries.YEARS_SQL).fetchall()
-        years = [r["ModelYear"] for r in rows]
-        if not years:
+        cat = get_catalog()
+        if not cat.years:
             return jsonify(error="No years found in AllCars"), 404
-        return jsonify(years=years)
+        return _json_bytes(cat.years_json)
     except Exception as e:
         return jsonify(error=f"/api/years failed: {e}"), 500
 
@@ -75,9 +95,7 @@ def makes():
     if year is None:
         return jsonify(error="Missing required param: year"), 400
     try:
-        with get_conn(readonly=True) as con:
-            rows = con.execute(queries.MAKES_SQL, {"year": year}).fetchall()
-        return jsonify(makes=[r["Make"] for r in rows])
+        return _json_bytes(get_catalog().makes_json(year))
     except Exception as e:
         return jsonify(error=f"/api/makes failed: {e}"), 500
 
@@ -88,16 +106,78 @@ def models():
     if year is None or not make:
         return jsonify(error="Missing required params: year, make"), 400
     try:
-        with get_conn(readonly=True) as con:
-            rows = con.execute(queries.MODELS_SQL, {"year": year, "make": make}).fetchall()
-        return jsonify(models=[r["Model"] for r in rows])
+        return _json_bytes(get_catalog().models_json(year, make))
     except Exception as e:
         return jsonify(error=f"/api/models failed: {e}"), 500
 
+@api_bp.get("/search")
+def search():
+    """
+    Typeahead: vehicles whose make/model match free text such as "2017 civic"
+    or "f150", best match first, then best score. A 4-digit year in the query
+    restricts results to that year; otherwise each make/model is returned for
+    its newest year, with all its years listed.
+    Query params: q, limit (default 10, max 50)
+    """
+    q = request.args.get("q", "", type=str).strip()
+    limit = max(1, min(request.args.get("limit", default=10, type=int), 50))
+    if not q:
+        return jsonify(ok=True, results=[])
+    try:
+        return jsonify(ok=True, results=vehicle_search.search(q, limit))
+    except Exception as e:
+        return jsonify(ok=False, error=f"/api/search failed: {e}"), 500
+
 # ----------------------------
 # Score + Details
 # ----------------------------
 
+def _score_body(v):
+    return {
+        "score": v.score,
+        "certainty": v.certainty,
+        "group_id": v.group_id,
+    }
+
+def _details_body(year, make, model, v):
+    rel = v.rel_ratio
+    if rel is None or rel <= 0:
+        y_value = None
+        direction = None
+    else:
+        if rel >= 1:
+            y_value = rel
+            direction = "less"
+        else:
+            y_value = 1.0 / rel
+            direction = "more"
+
+    return {
+        "year": year,
+        "make": make,
+        "model": model,
+        "group_id": v.group_id,
+        "complaint_count": v.complaint_count,
+        "rel_ratio": rel,
+        "y_value": y_value,
+        "direction": direction
+    }
+
+# Serialized /api/score and /api/details bodies per vehicle; the namespace is
+# versioned, so a new catalog DB starts it empty. None means not found.
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+@cache.memoize("vehicle-json", max_entries=8192)
+def _score_json(year, make, model):
+    v = resolve(year, make, model)
+    return None if v is None else _dumps(_score_body(v))
+
+@cache.memoize("vehicle-json", max_entries=8192)
+def _details_json(year, make, model):
+    v = resolve(year, make, model)
+    return None if v is None else _dumps(_details_body(year, make, model, v))
+
 @api_bp.get("/score")
 def score():
     year = request.args.get("year", type=int)
@@ -106,17 +186,10 @@ def score():
     if year is None or not make or not model:
         return jsonify(error="Missing required params: year, make, model"), 400
     try:
-        with get_conn(readonly=True) as con:
-            row = con.execute(queries.SCORE_SQL, {
-                "year": year, "make": make, "model": model
-            }).fetchone()
-        if not row:
+        body = _score_json(year, make, model)
+        if body is None:
             return jsonify(error="Not found"), 404
-        return jsonify({
-            "score": row.get("Score"),
-            "certainty": row.get("Certainty"),
-            "group_id": row.get("GroupID"),
-        })
+        return _json_bytes(body)
     except Exception as e:
         return jsonify(error=f"/api/score failed: {e}"), 500
 
@@ -130,39 +203,125 @@ def details():
         if not (year and make and model):
             return jsonify(error="Missing year/make/model"), 400
 
-        with get_conn(readonly=True) as con:
-            row = con.execute(queries.DETAILS_SQL, {
-                "year": year, "make": make, "model": model
-            }).fetchone()
-
-        if not row:
+        body = _details_json(year, make, model)
+        if body is None:
             return jsonify(error="Not found"), 404
 
-        rel = row.get("RelRatio")
-        if rel is None or rel <= 0:
-            y_value = None
-            direction = None
-        else:
-            if rel >= 1:
-                y_value = rel
-                direction = "less"
-            else:
-                y_value = 1.0 / rel
-                direction = "more"
-
-        return jsonify({
-            "year": row.get("ModelYear"),
-            "make": row.get("Make"),
-            "model": row.get("Model"),
-            "group_id": row.get("GroupID"),
-            "complaint_count": row.get("ComplaintCount"),
-            "rel_ratio": rel,
-            "y_value": y_value,
-            "direction": direction
-        })
+        return _json_bytes(body)
     except Exception as e:
         return jsonify(error=f"/api/details failed: {e}"), 500
 
+@api_bp.get("/grade")
+def grade():
+    """Score & Certainty rounded to 1 decimal for a Y/M/M tuple."""
+    year  = request.args.get("year", type=int)
+    make  = request.args.get("make", type=str)
+    model = request.args.get("model", type=str)
+    if year is None or not make or not model:
+        return jsonify(error="Missing params"), 400
+
+    try:
+        if allcars_columns().issuperset(queries.GRADE_COLUMNS):
+            sql, params = queries.GRADE_SQL, {"year": year, "make_key": name_key(make), "model_key": name_key(model)}
+        else:
+            sql, params = queries.GRADE_LEGACY_SQL, {"year": year, "make": make, "model": model}
+        rows = query_all(sql, params)
+        if not rows:
+            return jsonify(error="Not found"), 404
+        row = rows[0]
+        return jsonify(
+            year=year,
+            make=make,
+            model=model,
+            score=float(row["ScoreRounded"]) if row["ScoreRounded"] is not None else None,
+            certainty=float(row["CertaintyRounded"]) if row["CertaintyRounded"] is not None else None,
+        )
+    except Exception as e:
+        return jsonify(error=f"/api/grade failed: {e}"), 500
+
+def _bulk_item(item):
+    """(year, make, model) from {"year","make","model"} or [year, make, model]; None if malformed."""
+    if isinstance(item, dict):
+        item = (item.get("year"), item.get("make"), item.get("model"))
+    if not isinstance(item, (list, tuple)) or len(item) != 3:
+        return None
+    year, make, model = item
+    try:
+        year = int(year)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(make, str) or not isinstance(model, str) or not make.strip() or not model.strip():
+        return None
+    return year, make.strip(), model.strip()
+
+def _bulk_result(index, item):
+    key = _bulk_item(item)
+    if key is None:
+        return {"found": False, "error": "Missing year/make/model"}
+    year, make, model = key
+    v = index.get(key)
+    if v is None:
+        return {"year": year, "make": make, "model": model, "found": False, "error": "Not found"}
+    return {
+        "year": year,
+        "make": make,
+        "model": model,
+        "found": True,
+        "score": v.score,
+        "certainty": v.certainty,
+        "group_id": v.group_id,
+        "rel_ratio": v.rel_ratio,
+        "complaint_count": v.complaint_count,
+    }
+
+@api_bp.post("/grade/bulk")
+@requires_pass
+def grade_bulk():
+    """
+    Grade a batch of vehicles in one request, e.g. a dealer inventory.
+    Body: {"vehicles": [{"year": 2017, "make": "Honda", "model": "Civic"}, ...]}
+    (or a bare list; [year, make, model] arrays also work), up to
+    BULK_GRADE_MAX_ITEMS. Results come back in input order with found=false
+    and an error for unknown or malformed entries. Every entry is a lookup in
+    the per-version vehicle index, no SQL per vehicle. The body is streamed
+    in chunks: one JSON document by default, one result per line with
+    ?format=ndjson.
+    """
+    payload = request.get_json(silent=True)
+    items = payload.get("vehicles") if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        return jsonify(ok=False, error="Expected a JSON list of vehicles"), 400
+    max_items = current_app.config.get("BULK_GRADE_MAX_ITEMS", 50000)
+    if len(items) > max_items:
+        return jsonify(ok=False, error=f"At most {max_items} vehicles per request"), 413
+    fmt = request.args.get("format", "json").lower()
+    if fmt not in ("json", "ndjson"):
+        return jsonify(ok=False, error="format must be json or ndjson"), 400
+
+    try:
+        index = get_index()
+    except Exception as e:
+        return jsonify(ok=False, error=f"/api/grade/bulk failed: {e}"), 500
+
+    chunk = 1000
+
+    def generate():
+        missing = 0
+        if fmt == "json":
+            yield b'{"ok":true,"results":['
+        for start in range(0, len(items), chunk):
+            results = [_bulk_result(index, item) for item in items[start:start + chunk]]
+            missing += sum(1 for r in results if not r["found"])
+            if fmt == "ndjson":
+                yield b"".join(_dumps(r) + b"\n" for r in results)
+            else:
+                yield (b"," if start else b"") + b",".join(_dumps(r) for r in results)
+        if fmt == "json":
+            yield b'],"count":%d,"not_found":%d}' % (len(items), missing)
+
+    mimetype = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+    return current_app.response_class(generate(), mimetype=mimetype)
+
 # ----------------------------
 # Pass-gated data boxes
 # ----------------------------
@@ -171,69 +330,20 @@ def details():
 @requires_pass
 def top_complaints():
     try:
-        year = request.args.get("year")
+        year = request.args.get("year", type=int)
         make = request.args.get("make")
         model = request.args.get("model")
         if not (year and make and model):
             return jsonify(ok=False, error="Missing year/make/model"), 400
 
         # Resolve GroupID
-        group_id = None
-        with get_conn(readonly=True) as con:
-            cur = con.execute(
-                """
-                SELECT ac.GroupID
-                FROM AllCars ac
-                WHERE ac.ModelYear = :year
-                  AND ac.Make      = :make
-                  AND ac.Model     = :model
-                ORDER BY (ac.Score IS NULL), ac.Score DESC
-                LIMIT 1
-                """,
-                { "year": year, "make": make, "model": model }
-            )
-            row = cur.fetchone()
-            if row:
-                group_id = row.get("GroupID")
+        v = resolve(year, make, model)
+        group_id = v.group_id if v else None
 
         if not group_id:
             return jsonify(ok=False, error="GroupID not found for selection"), 404
 
-        # Read top3 from R2
-        from ..services.r2 import get_bytes, get_text, R2Error
-        import csv, io, re as _re
-
-        key_top3 = f"ResourceFiles/{group_id}/{group_id}_top3.csv"
-        try:
-            raw = get_bytes(key_top3)
-        except R2Error:
-            return jsonify(ok=True, group_id=group_id, items=[])
-
-        buf = io.StringIO(raw.decode("utf-8", errors="replace"))
-        reader = csv.DictReader(buf)
-        items = []
-        for r in reader:
-            comp = (r.get("Component") or "").strip()
-            try:
-                pct = float(r.get("Percentage"))
-            except Exception:
-                pct = None
-
-            summary = None
-            if comp:
-                comp_key = _re.sub(r'[\\/]+', '_', comp.upper()).strip()
-                key_sum = f"ResourceFiles/{group_id}/{comp_key}_llamasum.txt"
-                try:
-                    summary = get_text(key_sum).strip()
-                    prefix = "Here is a two-sentence summary of the data:"
-                    if summary[:len(prefix)].lower() == prefix.lower():
-                        summary = summary[len(prefix):].lstrip()
-                except R2Error:
-                    summary = None
-
-            items.append({ "component": comp, "percent": pct, "summary": summary })
-
-        return jsonify(ok=True, group_id=group_id, items=items)
+        return jsonify(artifacts.load_top_complaints(group_id))
     except Exception as e:
         return jsonify(ok=False, error=f"/api/top-complaints failed: {repr(e)}"), 500
 
@@ -242,64 +352,20 @@ def top_complaints():
 def trims():
     """Return trim/series complaint counts & percentages for a given Y/M/M."""
     try:
-        year = request.args.get("year")
+        year = request.args.get("year", type=int)
         make = request.args.get("make")
         model = request.args.get("model")
         if not (year and make and model):
             return jsonify(ok=False, error="Missing year/make/model"), 400
 
         # GroupID
-        group_id = None
-        with get_conn(readonly=True) as con:
-            cur = con.execute(
-                """
-                SELECT GroupID
-                FROM AllCars
-                WHERE ModelYear = ? AND Make = ? AND Model = ?
-                LIMIT 1
-                """,
-                (year, make, model)
-            )
-            row = cur.fetchone()
-            if row:
-                group_id = row['GroupID']
+        v = resolve(year, make, model)
+        group_id = v.group_id if v else None
 
         if group_id is None:
             return jsonify(ok=True, items=[], note="No GroupID for selection")
 
-        # Read CSV from R2
-        from ..services.r2 import get_bytes, R2Error
-        import csv, io, botocore
-
-        key = f"ResourceFiles/{group_id}/{group_id}_ymmtscount.csv"
-        try:
-            raw = get_bytes(key)
-        except (R2Error, botocore.exceptions.ClientError):
-            return jsonify(ok=True, group_id=group_id, items=[], note=f"Missing R2 object: {key}")
-
-        try:
-            f = io.StringIO(raw.decode("utf-8", errors="replace"))
-            reader = csv.DictReader(f)
-            items = []
-            for row in reader:
-                name = (row.get("Name") or "").strip()
-                vcount = row.get("Count", 0)
-                vpct = row.get("Percentage", 0)
-                try:
-                    count = int(float(vcount))
-                except Exception:
-                    count = 0
-                try:
-                    pct = float(vpct)
-                except Exception:
-                    pct = 0.0
-                items.append({"name": name, "count": count, "percentage": pct})
-
-            items.sort(key=lambda x: x["count"], reverse=True)
-            return jsonify(ok=True, group_id=group_id, key=key, items=items)
-        except Exception as parse_err:
-            return jsonify(ok=True, group_id=group_id, key=key, items=[], note=f"CSV parse error: {parse_err}"), 200
-
+        return jsonify(artifacts.load_trims(group_id))
     except Exception as e:
         return jsonify(ok=False, error=f"/api/trims failed: {repr(e)}"), 500
 
@@ -308,67 +374,109 @@ def trims():
 def history():
     """Return complaint history as {year, actual, expected} for a given Y/M/M."""
     try:
-        year = request.args.get("year")
+        year = request.args.get("year", type=int)
         make = request.args.get("make")
         model = request.args.get("model")
         if not (year and make and model):
             return jsonify(ok=False, error="Missing year/make/model"), 400
 
         # GroupID
-        group_id = None
-        with get_conn(readonly=True) as con:
-            cur = con.execute(
-                """
-                SELECT ac.GroupID
-                FROM AllCars ac
-                WHERE ac.ModelYear = :year
-                  AND ac.Make      = :make
-                  AND ac.Model     = :model
-                ORDER BY (ac.Score IS NULL), ac.Score DESC
-                LIMIT 1
-                """,
-                { "year": year, "make": make, "model": model }
-            )
-            row = cur.fetchone()
-            if row:
-                group_id = row["GroupID"]
+        v = resolve(year, make, model)
+        group_id = v.group_id if v else None
 
         if not group_id:
             return jsonify(ok=True, group_id=None, items=[])
 
-        # Read CSV from R2
-        from ..services.r2 import get_bytes, R2Error
-        import csv, io, botocore
-        key = f"ResourceFiles/{group_id}/{group_id}_cby.csv"
+        return jsonify(artifacts.load_history(group_id))
+    except Exception as e:
+        return jsonify(ok=False, error=f"/api/history failed: {repr(e)}"), 500
 
-        try:
-            raw = get_bytes(key)
-        except (R2Error, botocore.exceptions.ClientError):
-            return jsonify(ok=True, group_id=group_id, items=[], note=f"Missing R2 object: {key}")
+def _group_id(gid):
+    """A sidecar-store group key (text) as the other endpoints return GroupID: an int."""
+    try:
+        return int(gid)
+    except (TypeError, ValueError):
+        return gid
 
-        try:
-            f = io.StringIO(raw.decode("utf-8", errors="replace"))
-            reader = csv.DictReader(f)
-            items = []
-            for r in reader:
-                try:
-                    y  = int((r.get("Year") or "").strip())
-                except Exception:
-                    continue
-                def _to_num(val):
-                    try:
-                        return float(str(val).replace(",", "").strip())
-                    except Exception:
-                        return None
-                actual   = _to_num(r.get("Actual Count"))
-                expected = _to_num(r.get("Expected Count"))
-                items.append({"year": y, "actual": actual, "expected": expected})
-            items.sort(key=lambda x: x["year"])
-            return jsonify(ok=True, group_id=group_id, items=items)
-        except Exception as parse_err:
-            return jsonify(ok=True, group_id=group_id, items=[], note=f"CSV parse error: {parse_err}")
+@api_bp.get("/complaints/search")
+@requires_pass
+def complaints_search():
+    """
+    Full-text search over complaint components and summaries across every
+    group, e.g. "transmission shudder". Hits are ranked by relevance (bm25)
+    scaled by the complaint's percent, and list the catalog vehicles that
+    share the hit's GroupID. Needs the sidecar store (ARTIFACT_STORE_PATH)
+    synced with FTS5.
+    Query params: q, limit (default 20, max 100)
+    """
+    q = request.args.get("q", "", type=str).strip()
+    limit = max(1, min(request.args.get("limit", default=20, type=int), 100))
+    if not q:
+        return jsonify(ok=False, error="Missing q"), 400
+    try:
+        rows = artifact_store.search_complaints(q, limit)
+        if rows is None:
+            return jsonify(ok=False, error="Complaint search index not available"), 503
+        groups = vehicles_by_group()
+        results = [
+            {
+                "group_id": _group_id(r["group_id"]),
+                "component": r["component"],
+                "percent": r["percent"],
+                "snippet": r["snippet"],
+                "vehicles": [
+                    {"year": y, "make": mk, "model": md, "score": v.score}
+                    for y, mk, md, v in groups.get(r["group_id"], ())
+                ],
+            }
+            for r in rows
+        ]
+        return jsonify(ok=True, results=results)
     except Exception as e:
-        return jsonify(ok=False, error=f"/api/history failed: {repr(e)}"), 500
+        return jsonify(ok=False, error=f"/api/complaints/search failed: {e}"), 500
+
+# ----------------------------
+# Whole vehicle view in one call
+# ----------------------------
+
+@api_bp.get("/vehicle")
+def vehicle():
+    """
+    Score, details and the pass-gated boxes for a Y/M/M in one response.
+    The vehicle is resolved once and the R2-backed sections are fetched
+    concurrently. Without an active pass the gated sections are left out
+    and listed under "gated".
+    """
+    try:
+        year = request.args.get("year", type=int)
+        make = request.args.get("make")
+        model = request.args.get("model")
+        if not (year and make and model):
+            return jsonify(ok=False, error="Missing year/make/model"), 400
+
+        v = resolve(year, make, model)
+        if v is None:
+            return jsonify(ok=False, error="Not found"), 404
+
+        body = {
+            "ok": True,
+            "score": _score_body(v),
+            "details": _details_body(year, make, model, v),
+            "gated": [],
+        }
+        sections = list(artifacts.LOADERS)
+        if not has_active_pass_for_session():
+            body["gated"] = sections
+        elif v.group_id:
+            body.update(artifacts.load_sections(v.group_id, sections))
+        else:
+            # same bodies the individual routes send when there is no GroupID
+            body["top_complaints"] = {"ok": False, "error": "GroupID not found for selection"}
+            body["trims"] = {"ok": True, "items": [], "note": "No GroupID for selection"}
+            body["history"] = {"ok": True, "group_id": None, "items": []}
+        return jsonify(body)
+    except Exception as e:
+        return jsonify(ok=False, error=f"/api/vehicle failed: {repr(e)}"), 500
 
 @api_bp.get("/r2-check")
 def r2_check():
@@ -377,11 +485,11 @@ def r2_check():
         key = request.args.get("key")
         if not key:
             return jsonify(ok=False, error="Missing key param"), 400
-        from ..services.r2 import get_bytes, R2Error
+        from ..services.r2 import get_bytes, cache_stats
         import binascii
         data = get_bytes(key)
         head = binascii.hexlify(data[:16]).decode("ascii")
-        return jsonify(ok=True, key=key, size=len(data), head_hex=head)
+        return jsonify(ok=True, key=key, size=len(data), head_hex=head, cache=cache_stats())
     except Exception as e:
         return jsonify(ok=False, error=f"/api/r2-check failed: {e}")
 
@@ -408,7 +516,7 @@ def _build_in_clause(prefix: str, values: list[str]):
 
 @api_bp.get("/filter/makes")
 def filter_makes():
-    """Distinct makes across a year range."""
+    """Distinct makes across a year range (year_index bitsets; SQL for text-year catalogs)."""
     min_year = request.args.get("min_year", type=int)
     max_year = request.args.get("max_year", type=int)
     if min_year is None or max_year is None:
@@ -417,11 +525,13 @@ def filter_makes():
         min_year, max_year = max_year, min_year
 
     try:
-        with get_conn(readonly=True) as con:
-            rows = con.execute(
-                queries.FILTER_MAKES_RANGE_SQL,
-                {"min_year": min_year, "max_year": max_year}
-            ).fetchall()
+        makes = year_index.makes_between(min_year, max_year)
+        if makes is not None:
+            return jsonify(ok=True, makes=makes)
+        rows = query_all(
+            queries.FILTER_MAKES_RANGE_SQL,
+            {"min_year": min_year, "max_year": max_year}
+        )
         return jsonify(ok=True, makes=[r["Make"] for r in rows])
     except Exception as e:
         return jsonify(ok=False, error=f"/api/filter/makes failed: {e}"), 500
@@ -449,50 +559,49 @@ def filter_models():
     sql = queries.FILTER_MODELS_RANGE_SQL_BASE.format(makes_clause=makes_sql)
 
     try:
+        models = year_index.models_between(min_year, max_year, makes)
+        if models is not None:
+            return jsonify(ok=True, models=models)
         params = {"min_year": min_year, "max_year": max_year, **make_params}
-        with get_conn(readonly=True) as con:
-            rows = con.execute(sql, params).fetchall()
+        rows = query_all(sql, params)
         return jsonify(ok=True, models=[r["Model"] for r in rows])
     except Exception as e:
         return jsonify(ok=False, error=f"/api/filter/models failed: {e}"), 500
 
-@api_bp.get("/filter/search")
-@requires_pass
-def filter_search():
+def _search_filters():
     """
-    Return rows (Year, Make, Model, Score) across a year range with optional
-    multi-make, multi-model, and min/max score filters. Max 100 rows.
-    Query params:
-      min_year, max_year (required)
-      makes=comma,separated,list (optional)
-      models=comma,separated,list (optional)
-      min_score, max_score (optional; leave blank for no bound)
-      limit (optional; default 100; capped at 100)
+    The filters shared by /api/filter/search and /api/filter/facets as keyword
+    arguments for app.services.snapshot and app.services.facets, or None when
+    a year bound is missing.
     """
     min_year = request.args.get("min_year", type=int)
     max_year = request.args.get("max_year", type=int)
-    limit    = request.args.get("limit", default=100, type=int)
-    limit = max(1, min(limit, 100))
-
     if min_year is None or max_year is None:
-        return jsonify(ok=False, error="Missing min_year/max_year"), 400
+        return None
     if min_year > max_year:
         min_year, max_year = max_year, min_year
 
     makes_raw  = request.args.get("makes", "", type=str).strip()
     models_raw = request.args.get("models", "", type=str).strip()
-    min_score  = request.args.get("min_score", type=float)
-    max_score  = request.args.get("max_score", type=float)
 
-    makes  = [m for m in (s.strip() for s in makes_raw.split(",")) if m] if makes_raw else []
-    models = [m for m in (s.strip() for s in models_raw.split(",")) if m] if models_raw else []
+    return {
+        "min_year":  min_year,
+        "max_year":  max_year,
+        "makes":     [m for m in (s.strip() for s in makes_raw.split(",")) if m] if makes_raw else [],
+        "models":    [m for m in (s.strip() for s in models_raw.split(",")) if m] if models_raw else [],
+        "min_score": request.args.get("min_score", type=float),
+        "max_score": request.args.get("max_score", type=float),
+    }
 
-    makes_clause, make_params   = _build_in_clause("m", makes)
-    models_clause, model_params = _build_in_clause("d", models)
+def _search_sql(base: str, f: dict, **clauses):
+    """(sql, params) for FILTER_SEARCH_SQL_BASE / FILTER_FACETS_SQL_BASE and filters f."""
+    makes_clause, make_params   = _build_in_clause("m", f["makes"])
+    models_clause, model_params = _build_in_clause("d", f["models"])
 
     makes_sql  = f"AND Make {makes_clause}" if makes_clause else ""
     models_sql = f"AND Model {models_clause}" if models_clause else ""
 
+    min_score, max_score = f["min_score"], f["max_score"]
     if min_score is not None and max_score is not None:
         score_sql = "AND Score BETWEEN :min_score AND :max_score"
     elif min_score is not None:
@@ -502,31 +611,218 @@ def filter_search():
     else:
         score_sql = ""
 
-    sql = queries.FILTER_SEARCH_SQL_BASE.format(
+    sql = base.format(
         makes_clause=makes_sql,
         models_clause=models_sql,
-        score_clause=score_sql
+        score_clause=score_sql,
+        **clauses
     )
-
+    params = {
+        "min_year": f["min_year"],
+        "max_year": f["max_year"],
+        **make_params,
+        **model_params,
+    }
+    if min_score is not None: params["min_score"] = min_score
+    if max_score is not None: params["max_score"] = max_score
+    return sql, params
+
+def _encode_cursor(row: dict) -> str:
+    """Opaque keyset cursor: the sort key (score, year, make, model) of a row."""
+    key = [row["score"], row["year"], row["make"], row["model"]]
+    return base64.urlsafe_b64encode(_dumps(key)).decode("ascii").rstrip("=")
+
+def _decode_cursor(token: str):
+    """(score, year, make, model) from _encode_cursor, or ValueError."""
     try:
-        params = {
-            "min_year": min_year,
-            "max_year": max_year,
-            "limit":    limit,
-            **make_params,
-            **model_params,
-        }
-        if min_score is not None: params["min_score"] = min_score
-        if max_score is not None: params["max_score"] = max_score
+        key = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except Exception:
+        raise ValueError("bad cursor")
+    if not isinstance(key, list) or len(key) != 4:
+        raise ValueError("bad cursor")
+    return tuple(key)
+
+def _search_page(f: dict, after, snapshot_limit: int, sql_limit: int):
+    """
+    (rows, limit) for one page of /api/filter/search: rows sorting after the
+    cursor key `after` (None for the first page), from the columnar snapshot
+    when it is serving, else from FILTER_SEARCH_SQL_BASE.
+    """
+    try:
+        data = snapshot.search(snapshot_limit, after=after, **f)
+        if data is not None:
+            return data, snapshot_limit
+    except Exception:
+        current_app.logger.exception("filter snapshot failed; using SQL")
+
+    sql, params = _search_sql(
+        queries.FILTER_SEARCH_SQL_BASE, f,
+        after_clause=queries.FILTER_SEARCH_AFTER_CLAUSE if after is not None else "",
+    )
+    params["limit"] = sql_limit
+    if after is not None:
+        params.update(zip(("after_score", "after_year", "after_make", "after_model"), after))
 
-        with get_conn(readonly=True) as con:
-            rows = con.execute(sql, params).fetchall()
-        data = [
-            {"year": r["Year"], "make": r["Make"], "model": r["Model"], "score": r["Score"]}
-            for r in rows
-        ]
-        return jsonify(ok=True, rows=data, capped=(len(data) >= limit))
+    rows = query_all(sql, params)
+    data = [
+        {"year": r["Year"], "make": r["Make"], "model": r["Model"], "score": r["Score"]}
+        for r in rows
+    ]
+    return data, sql_limit
+
+@api_bp.get("/filter/search")
+@requires_pass
+def filter_search():
+    """
+    Return rows (Year, Make, Model, Score) across a year range with optional
+    multi-make, multi-model, and min/max score filters. Max 100 rows, or
+    FILTER_SEARCH_MAX_LIMIT when the columnar snapshot is serving.
+    Query params:
+      min_year, max_year (required)
+      makes=comma,separated,list (optional)
+      models=comma,separated,list (optional)
+      min_score, max_score (optional; leave blank for no bound)
+      limit (optional; default 100; capped as above)
+      cursor (optional; next_cursor of the previous page, same filters)
+    """
+    requested = request.args.get("limit", default=100, type=int)
+    limit = max(1, min(requested, 100))
+    big_limit = max(1, min(requested, current_app.config.get("FILTER_SEARCH_MAX_LIMIT", 1000)))
+
+    f = _search_filters()
+    if f is None:
+        return jsonify(ok=False, error="Missing min_year/max_year"), 400
+
+    after = None
+    if request.args.get("cursor"):
+        try:
+            after = _decode_cursor(request.args["cursor"])
+        except ValueError as e:
+            return jsonify(ok=False, error=str(e)), 400
+
+    try:
+        data, used = _search_page(f, after, big_limit, limit)
+        capped = len(data) >= used
+        return jsonify(ok=True, rows=data, capped=capped,
+                       next_cursor=_encode_cursor(data[-1]) if capped else None)
     except Exception as e:
         return jsonify(ok=False, error=f"/api/filter/search failed: {e}"), 500
 
+_EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+@api_bp.get("/filter/export")
+@requires_pass
+def filter_export():
+    """
+    Every row /api/filter/search would page through, streamed as NDJSON
+    (default) or CSV. Pages of FILTER_SEARCH_MAX_LIMIT rows are fetched by
+    keyset cursor as the client reads, so memory stays flat and no catalog
+    connection is held while the client is slow.
+    Query params: the /api/filter/search filters, format=ndjson|csv
+    """
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in _EXPORT_FORMATS:
+        return jsonify(ok=False, error="format must be ndjson or csv"), 400
+    f = _search_filters()
+    if f is None:
+        return jsonify(ok=False, error="Missing min_year/max_year"), 400
+    page = max(1, current_app.config.get("FILTER_SEARCH_MAX_LIMIT", 1000))
+
+    # first page before the headers go out, so a broken query is still a 500
+    try:
+        first = _search_page(f, None, page, page)
+    except Exception as e:
+        return jsonify(ok=False, error=f"/api/filter/export failed: {e}"), 500
+
+    def pages():
+        data, used = first
+        while True:
+            yield data
+            if len(data) < used:
+                return
+            r = data[-1]
+            data, used = _search_page(f, (r["score"], r["year"], r["make"], r["model"]), page, page)
+
+    def generate():
+        if fmt == "csv":
+            buf = io.StringIO()
+            out = csv.writer(buf)
+            out.writerow(("year", "make", "model", "score"))
+        try:
+            for data in pages():
+                if fmt == "csv":
+                    out.writerows((r["year"], r["make"], r["model"], r["score"]) for r in data)
+                    chunk = buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate()
+                else:
+                    chunk = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in data)
+                if chunk:
+                    yield chunk
+        except Exception:
+            # headers are gone; the client sees a truncated body
+            current_app.logger.exception("/api/filter/export failed mid-stream")
+
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype=_EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=cargrader-search.{fmt}"},
+    )
+
+def _count_facets(rows, width: float) -> dict:
+    """facets.facets() counts from FILTER_FACETS_SQL_BASE rows."""
+    buckets, makes, years = {}, {}, {}
+    unscored = 0
+    for r in rows:
+        score = r["Score"]
+        if score is None:
+            unscored += 1
+        else:
+            low = math.floor(score / width) * width
+            buckets[low] = buckets.get(low, 0) + 1
+        makes[r["Make"]] = makes.get(r["Make"], 0) + 1
+        years[r["Year"]] = years.get(r["Year"], 0) + 1
+    return {
+        "total": len(rows),
+        "unscored": unscored,
+        "buckets": sorted(buckets.items()),
+        "makes": sorted(makes.items(), key=lambda kv: (kv[0] is not None, kv[0] or "")),
+        "years": sorted(years.items(), key=lambda kv: (kv[0] is not None, kv[0] or 0)),
+    }
+
+@api_bp.get("/filter/facets")
+@requires_pass
+def filter_facets():
+    """
+    Counts for the filter UI over the vehicles /api/filter/search would match
+    (no row limit): per score bucket (FILTER_FACET_BUCKET wide, by each
+    vehicle's best score), per make and per year.
+    Query params: same filters as /api/filter/search.
+    """
+    f = _search_filters()
+    if f is None:
+        return jsonify(ok=False, error="Missing min_year/max_year"), 400
+    width = current_app.config.get("FILTER_FACET_BUCKET", 10.0)
 
+    counts = None
+    try:
+        counts = facets.facets(width, **f)
+    except Exception:
+        current_app.logger.exception("facet index failed; using SQL")
+    try:
+        if counts is None:
+            sql, params = _search_sql(queries.FILTER_FACETS_SQL_BASE, f)
+            counts = _count_facets(query_all(sql, params), width)
+        return jsonify(
+            ok=True,
+            total=counts["total"],
+            unscored=counts["unscored"],
+            score_buckets=[{"min": low, "max": low + width, "count": n} for low, n in counts["buckets"]],
+            makes=[{"make": m, "count": n} for m, n in counts["makes"]],
+            years=[{"year": y, "count": n} for y, n in counts["years"]],
+        )
+    except Exception as e:
+        return jsonify(ok=False, error=f"/api/filter/facets failed: {e}"), 500
@@ -0,0 +1,252 @@
+# Local sidecar copy of ResourceFiles/, pre-parsed into typed SQLite tables
+# keyed by GroupID. Written by `python -m app.tools.sync_artifacts`, read
+# (read-only, pooled) by app.services.artifacts before it falls back to R2,
+# and searched full-text by /api/complaints/search.
+import os
+import re
+import sqlite3
+import datetime as dt
+from typing import NamedTuple, Optional
+from flask import current_app
+from app.db.connection import coalesce, db_version, pooled_conn
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+-- one row per synced group; has_* is 1 if the source object existed, 0 if not
+CREATE TABLE IF NOT EXISTS groups (
+    group_id    TEXT PRIMARY KEY,
+    has_top3    INTEGER NOT NULL,
+    has_trims   INTEGER NOT NULL,
+    has_history INTEGER NOT NULL,
+    synced_at   TEXT NOT NULL
+);
+-- source objects and the ETag they had when parsed
+CREATE TABLE IF NOT EXISTS sources (
+    key      TEXT PRIMARY KEY,
+    group_id TEXT NOT NULL,
+    etag     TEXT,
+    size     INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_sources_group ON sources(group_id);
+CREATE TABLE IF NOT EXISTS top_complaints (
+    group_id  TEXT NOT NULL,
+    ord       INTEGER NOT NULL,
+    component TEXT NOT NULL,
+    percent   REAL,
+    summary   TEXT,
+    PRIMARY KEY (group_id, ord)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS trims (
+    group_id   TEXT NOT NULL,
+    ord        INTEGER NOT NULL,   -- already sorted by count desc
+    name       TEXT NOT NULL,
+    count      INTEGER NOT NULL,
+    percentage REAL NOT NULL,
+    PRIMARY KEY (group_id, ord)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS history (
+    group_id TEXT NOT NULL,
+    ord      INTEGER NOT NULL,     -- already sorted by year
+    year     INTEGER NOT NULL,
+    actual   REAL,
+    expected REAL,
+    PRIMARY KEY (group_id, ord)
+) WITHOUT ROWID;
+"""
+
+# Full-text index over top_complaints (component names + summaries) for
+# /api/complaints/search. complaints_fts rows are keyed by complaint_docs.id,
+# which points back at (group_id, ord). Kept separate from SCHEMA because
+# FTS5 is a compile-time option: a SQLite without it still gets the rest.
+FTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS complaint_docs (
+    id       INTEGER PRIMARY KEY,
+    group_id TEXT NOT NULL,
+    ord      INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_complaint_docs_group ON complaint_docs(group_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS complaints_fts USING fts5(
+    component, summary, tokenize = 'porter unicode61'
+);
+"""
+
+# bm25 with component matches weighted over summary matches, scaled up by the
+# complaint's share of the group's complaints (percent); lower is better.
+SEARCH_COMPLAINTS_SQL = """
+SELECT d.group_id, t.component, t.percent,
+       snippet(complaints_fts, 1, '[', ']', '...', 16) AS snippet,
+       bm25(complaints_fts, 2.0, 1.0) * (1 + COALESCE(t.percent, 0) / 100.0) AS rank
+FROM complaints_fts
+JOIN complaint_docs d ON d.id = complaints_fts.rowid
+JOIN top_complaints t ON t.group_id = d.group_id AND t.ord = d.ord
+WHERE complaints_fts MATCH :match
+ORDER BY rank
+LIMIT :limit
+"""
+
+# artifact -> (groups flag column, table, columns returned in order)
+_ARTIFACTS = {
+    "top_complaints": ("has_top3", "top_complaints", ("component", "percent", "summary")),
+    "trims": ("has_trims", "trims", ("name", "count", "percentage")),
+    "history": ("has_history", "history", ("year", "actual", "expected")),
+}
+
+
+class Stored(NamedTuple):
+    present: bool   # False: the source object does not exist for this group
+    items: list
+
+
+def store_path() -> Optional[str]:
+    path = current_app.config.get("ARTIFACT_STORE_PATH")
+    if path and os.path.exists(path):
+        return path
+    return None
+
+def lookup(group_id, artifact: str) -> Optional[Stored]:
+    """Pre-parsed rows for a group, or None if the store does not have the group."""
+    path = store_path()
+    if path is None:
+        return None
+    try:
+        # concurrent requests for the same group share one pair of queries
+        return coalesce((db_version(path), str(group_id), artifact), _lookup, path, group_id, artifact)
+    except sqlite3.Error:
+        current_app.logger.exception("artifact store lookup failed; falling back to R2")
+        return None
+
+def _lookup(path, group_id, artifact) -> Optional[Stored]:
+    flag, table, cols = _ARTIFACTS[artifact]
+    with pooled_conn(path) as con:
+        g = con.execute(f"SELECT {flag} AS present FROM groups WHERE group_id = ?",
+                        (str(group_id),)).fetchone()
+        if g is None:
+            return None
+        if not g["present"]:
+            return Stored(False, [])
+        rows = con.execute(
+            f"SELECT {', '.join(cols)} FROM {table} WHERE group_id = ? ORDER BY ord",
+            (str(group_id),),
+        ).fetchall()
+    return Stored(True, rows)
+
+
+def match_expression(text: str) -> Optional[str]:
+    """User text as an FTS5 query: every word must match (stemmed); no operators."""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    return " ".join(f'"{w}"' for w in words)
+
+def search_complaints(text: str, limit: int = 20) -> Optional[list]:
+    """
+    Complaint rows (group_id, component, percent, snippet, rank) matching text,
+    best first; None if there is no store or it was built without FTS5.
+    """
+    path = store_path()
+    if path is None:
+        return None
+    match = match_expression(text)
+    with pooled_conn(path) as con:
+        if not has_fts(con):
+            return None
+        if match is None:
+            return []
+        return con.execute(SEARCH_COMPLAINTS_SQL, {"match": match, "limit": limit}).fetchall()
+
+
+# ---- writing (sync tool) ----
+
+def open_for_write(path: str) -> sqlite3.Connection:
+    con = sqlite3.connect(path)
+    con.row_factory = sqlite3.Row
+    con.executescript(SCHEMA)
+    try:
+        con.executescript(FTS_SCHEMA)
+    except sqlite3.OperationalError:
+        pass  # no FTS5 in this SQLite; complaint search stays unavailable
+    return con
+
+def has_fts(con) -> bool:
+    return con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'complaints_fts'"
+    ).fetchone() is not None
+
+def _unindex_group(con, gid: str):
+    con.execute("DELETE FROM complaints_fts WHERE rowid IN (SELECT id FROM complaint_docs WHERE group_id = ?)", (gid,))
+    con.execute("DELETE FROM complaint_docs WHERE group_id = ?", (gid,))
+
+def _index_group(con, gid: str, top3):
+    for i, it in enumerate(top3 or []):
+        cur = con.execute("INSERT INTO complaint_docs (group_id, ord) VALUES (?, ?)", (gid, i))
+        con.execute("INSERT INTO complaints_fts (rowid, component, summary) VALUES (?, ?, ?)",
+                    (cur.lastrowid, it["component"], it["summary"]))
+
+def needs_reindex(con) -> bool:
+    """True for a store synced before it had the FTS index (complaints, no docs)."""
+    if not has_fts(con):
+        return False
+    docs = con.execute("SELECT 1 FROM complaint_docs LIMIT 1").fetchone()
+    rows = con.execute("SELECT 1 FROM top_complaints LIMIT 1").fetchone()
+    return docs is None and rows is not None
+
+def reindex_complaints(con) -> int:
+    """Rebuild complaints_fts from top_complaints; returns the number of rows indexed."""
+    con.execute("DELETE FROM complaints_fts")
+    con.execute("DELETE FROM complaint_docs")
+    con.execute("INSERT INTO complaint_docs (group_id, ord) SELECT group_id, ord FROM top_complaints")
+    con.execute("""
+        INSERT INTO complaints_fts (rowid, component, summary)
+        SELECT d.id, t.component, t.summary
+        FROM complaint_docs d JOIN top_complaints t ON t.group_id = d.group_id AND t.ord = d.ord
+    """)
+    return con.execute("SELECT COUNT(*) FROM complaint_docs").fetchone()[0]
+
+def synced_etags(con) -> dict:
+    return {r["key"]: r["etag"] for r in con.execute("SELECT key, etag FROM sources")}
+
+def replace_group(con, group_id, sources, top3, trims, history):
+    """
+    Replace everything stored for one group. top3/trims/history are parsed
+    item lists, or None when the source object does not exist; sources is
+    [{"key", "etag", "size"}].
+    """
+    gid = str(group_id)
+    for table in ("sources", "top_complaints", "trims", "history"):
+        con.execute(f"DELETE FROM {table} WHERE group_id = ?", (gid,))
+    fts = has_fts(con)
+    if fts:
+        _unindex_group(con, gid)
+    con.executemany(
+        "INSERT INTO sources (key, group_id, etag, size) VALUES (?, ?, ?, ?)",
+        [(s["key"], gid, s.get("etag"), s.get("size")) for s in sources],
+    )
+    con.executemany(
+        "INSERT INTO top_complaints VALUES (?, ?, ?, ?, ?)",
+        [(gid, i, it["component"], it["percent"], it["summary"]) for i, it in enumerate(top3 or [])],
+    )
+    con.executemany(
+        "INSERT INTO trims VALUES (?, ?, ?, ?, ?)",
+        [(gid, i, it["name"], it["count"], it["percentage"]) for i, it in enumerate(trims or [])],
+    )
+    con.executemany(
+        "INSERT INTO history VALUES (?, ?, ?, ?, ?)",
+        [(gid, i, it["year"], it["actual"], it["expected"]) for i, it in enumerate(history or [])],
+    )
+    if fts:
+        _index_group(con, gid, top3)
+    con.execute(
+        "INSERT OR REPLACE INTO groups VALUES (?, ?, ?, ?, ?)",
+        (gid, top3 is not None, trims is not None, history is not None,
+         dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat()),
+    )
+
+def drop_group(con, group_id):
+    gid = str(group_id)
+    for table in ("groups", "sources", "top_complaints", "trims", "history"):
+        con.execute(f"DELETE FROM {table} WHERE group_id = ?", (gid,))
+    if has_fts(con):
+        _unindex_group(con, gid)
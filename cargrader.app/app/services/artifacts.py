@@ -0,0 +1,222 @@
+# Per-GroupID data boxes (top complaints, trims, history): served from the
+# local sidecar store when it has the group, otherwise read from R2.
+# Each loader returns the JSON body its /api route sends.
+import csv
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
+from flask import current_app
+from . import artifact_store
+from . import r2
+from . import storage
+
+SUMMARY_PREFIX = "Here is a two-sentence summary of the data:"
+
+def _missing_errors():
+    return (r2.R2Error, storage.StorageError)
+
+def read_artifact(group_id, filename: str) -> bytes:
+    """
+    ResourceFiles/{group_id}/{filename}, taken from the group's packed
+    bundle when it holds the file and from the individual object otherwise
+    (no bundle, or the file was published after the bundle was packed).
+    """
+    try:
+        return r2.get_bundle_member(group_id, filename)
+    except r2.BundleMissing:
+        return r2.get_bytes(f"ResourceFiles/{group_id}/{filename}")
+
+def _csv_rows(raw: bytes):
+    return csv.DictReader(io.StringIO(raw.decode("utf-8", errors="replace")))
+
+def _to_num(val):
+    try:
+        return float(str(val).replace(",", "").strip())
+    except Exception:
+        return None
+
+# ---- parsers (shared with the sidecar store sync) ----
+
+def summary_filename(component: str) -> str:
+    comp_key = re.sub(r'[\\/]+', '_', component.upper()).strip()
+    return f"{comp_key}_llamasum.txt"
+
+def clean_summary(text: str) -> str:
+    summary = text.strip()
+    if summary[:len(SUMMARY_PREFIX)].lower() == SUMMARY_PREFIX.lower():
+        summary = summary[len(SUMMARY_PREFIX):].lstrip()
+    return summary
+
+def parse_top3(raw: bytes):
+    """[{component, percent, summary=None}] in CSV order."""
+    items = []
+    for r in _csv_rows(raw):
+        comp = (r.get("Component") or "").strip()
+        try:
+            pct = float(r.get("Percentage"))
+        except Exception:
+            pct = None
+        items.append({"component": comp, "percent": pct, "summary": None})
+    return items
+
+def parse_trims(raw: bytes):
+    """[{name, count, percentage}] sorted by count, highest first."""
+    items = []
+    for row in _csv_rows(raw):
+        name = (row.get("Name") or "").strip()
+        try:
+            count = int(float(row.get("Count", 0)))
+        except Exception:
+            count = 0
+        try:
+            pct = float(row.get("Percentage", 0))
+        except Exception:
+            pct = 0.0
+        items.append({"name": name, "count": count, "percentage": pct})
+    items.sort(key=lambda x: x["count"], reverse=True)
+    return items
+
+def parse_history(raw: bytes):
+    """[{year, actual, expected}] sorted by year; rows without a year are skipped."""
+    items = []
+    for r in _csv_rows(raw):
+        try:
+            y = int((r.get("Year") or "").strip())
+        except Exception:
+            continue
+        items.append({
+            "year": y,
+            "actual": _to_num(r.get("Actual Count")),
+            "expected": _to_num(r.get("Expected Count")),
+        })
+    items.sort(key=lambda x: x["year"])
+    return items
+
+# ---- loaders ----
+
+def _summary(group_id, filename):
+    try:
+        return clean_summary(read_artifact(group_id, filename).decode("utf-8", errors="replace"))
+    except _missing_errors():
+        return None
+
+def load_top_complaints(group_id):
+    stored = artifact_store.lookup(group_id, "top_complaints")
+    if stored is not None:
+        return {"ok": True, "group_id": group_id, "items": stored.items}
+
+    try:
+        raw = read_artifact(group_id, f"{group_id}_top3.csv")
+    except _missing_errors():
+        return {"ok": True, "group_id": group_id, "items": []}
+
+    items = parse_top3(raw)
+
+    # Summaries are fetched concurrently; whatever is not back by the
+    # deadline (or is missing) stays null. Late fetches still finish in the
+    # background and land in the R2 cache for the next request.
+    run = _in_app_context(_summary)
+    futures = {}
+    for i, it in enumerate(items):
+        if it["component"]:
+            fname = summary_filename(it["component"])
+            futures[_get_executor("summaries").submit(run, group_id, fname)] = i
+    if futures:
+        deadline = current_app.config.get("SUMMARY_FETCH_DEADLINE", 3.0)
+        done, _ = wait(futures, timeout=deadline)
+        for fut, i in futures.items():
+            if fut in done and fut.exception() is None:
+                items[i]["summary"] = fut.result()
+            else:
+                fut.cancel()
+
+    return {"ok": True, "group_id": group_id, "items": items}
+
+def load_trims(group_id):
+    key = f"ResourceFiles/{group_id}/{group_id}_ymmtscount.csv"
+    stored = artifact_store.lookup(group_id, "trims")
+    if stored is not None:
+        if not stored.present:
+            return {"ok": True, "group_id": group_id, "items": [], "note": f"Missing R2 object: {key}"}
+        return {"ok": True, "group_id": group_id, "key": key, "items": stored.items}
+
+    try:
+        raw = read_artifact(group_id, f"{group_id}_ymmtscount.csv")
+    except _missing_errors():
+        return {"ok": True, "group_id": group_id, "items": [], "note": f"Missing R2 object: {key}"}
+
+    try:
+        return {"ok": True, "group_id": group_id, "key": key, "items": parse_trims(raw)}
+    except Exception as parse_err:
+        return {"ok": True, "group_id": group_id, "key": key, "items": [], "note": f"CSV parse error: {parse_err}"}
+
+def load_history(group_id):
+    key = f"ResourceFiles/{group_id}/{group_id}_cby.csv"
+    stored = artifact_store.lookup(group_id, "history")
+    if stored is not None:
+        if not stored.present:
+            return {"ok": True, "group_id": group_id, "items": [], "note": f"Missing R2 object: {key}"}
+        return {"ok": True, "group_id": group_id, "items": stored.items}
+
+    try:
+        raw = read_artifact(group_id, f"{group_id}_cby.csv")
+    except _missing_errors():
+        return {"ok": True, "group_id": group_id, "items": [], "note": f"Missing R2 object: {key}"}
+
+    try:
+        return {"ok": True, "group_id": group_id, "items": parse_history(raw)}
+    except Exception as parse_err:
+        return {"ok": True, "group_id": group_id, "items": [], "note": f"CSV parse error: {parse_err}"}
+
+
+LOADERS = {
+    "top_complaints": load_top_complaints,
+    "trims": load_trims,
+    "history": load_history,
+}
+
+_executors = {}
+_executor_lock = Lock()
+
+# Separate pools so section loaders (which fan out summary reads) never
+# wait on work queued behind themselves.
+_POOL_SIZES = {
+    "sections": "ARTIFACT_FETCH_WORKERS",
+    "summaries": "SUMMARY_FETCH_WORKERS",
+}
+
+def _get_executor(name):
+    ex = _executors.get(name)
+    if ex is None:
+        with _executor_lock:
+            ex = _executors.get(name)
+            if ex is None:
+                workers = current_app.config.get(_POOL_SIZES[name], 8)
+                ex = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+                _executors[name] = ex
+    return ex
+
+def _in_app_context(fn):
+    """Wrap fn so it runs inside the current app's context on a pool thread."""
+    app = current_app._get_current_object()
+
+    def run(*args):
+        with app.app_context():
+            return fn(*args)
+    return run
+
+def load_sections(group_id, names):
+    """
+    Run the named loaders concurrently on the shared bounded pool.
+    Returns {name: body}; a loader that raises yields an ok=False body.
+    """
+    run = _in_app_context(lambda name: LOADERS[name](group_id))
+    futures = {name: _get_executor("sections").submit(run, name) for name in names}
+    out = {}
+    for name, fut in futures.items():
+        try:
+            out[name] = fut.result()
+        except Exception as e:
+            out[name] = {"ok": False, "group_id": group_id, "error": repr(e)}
+    return out
@@ -0,0 +1,93 @@
+# Packed per-GroupID artifact bundles.
+#
+# Layout of ResourceFiles/{group_id}/{group_id}.bundle:
+#   b"CGB1"                   magic
+#   uint32 (big endian)       length of the JSON header
+#   JSON header               {"v": 1, "members": {name: [offset, length, raw_length]}}
+#   member data               each member zlib-compressed on its own
+#
+# Offsets are relative to the first byte after the header, so a reader can
+# fetch the header with one small Range request and any member with another.
+#
+# Members are the files the loaders read (app.services.artifacts):
+# {group_id}_top3.csv, _ymmtscount.csv, _cby.csv and {component}_llamasum.txt.
+import json
+import re
+import struct
+import zlib
+from typing import Dict, Tuple
+
+MAGIC = b"CGB1"
+PREFIX_LEN = len(MAGIC) + 4
+# First Range read; big enough for the header of a typical bundle.
+HEADER_PROBE_BYTES = 16 * 1024
+
+
+class BundleError(Exception):
+    pass
+
+
+_ARTIFACT_KEY = re.compile(
+    r"ResourceFiles/(?P<gid>[\w-][\w.-]*)/(?P<name>(?P=gid)_(?:top3|ymmtscount|cby)\.csv"
+    r"|(?P=gid)\.bundle|[^./][^/]*_llamasum\.txt)")
+
+
+def bundle_key(group_id) -> str:
+    return f"ResourceFiles/{group_id}/{group_id}.bundle"
+
+def is_artifact_key(key: str) -> bool:
+    """Whether key names a group's bundle or one of its members."""
+    return _ARTIFACT_KEY.fullmatch(key) is not None
+
+def is_member(group_id, name: str) -> bool:
+    """Whether name is a file the loaders read for the group, i.e. belongs in its bundle."""
+    m = _ARTIFACT_KEY.fullmatch(f"ResourceFiles/{group_id}/{name}")
+    return m is not None and m.group("name") != f"{group_id}.bundle"
+
+def pack(members: Dict[str, bytes], level: int = 9) -> bytes:
+    index = {}
+    chunks = []
+    offset = 0
+    for name in sorted(members):
+        raw = members[name]
+        comp = zlib.compress(raw, level)
+        index[name] = [offset, len(comp), len(raw)]
+        chunks.append(comp)
+        offset += len(comp)
+    header = json.dumps({"v": 1, "members": index}, separators=(",", ":")).encode("utf-8")
+    return MAGIC + struct.pack(">I", len(header)) + header + b"".join(chunks)
+
+def header_length(prefix: bytes) -> int:
+    """Total bytes taken by magic + length + header, from the first PREFIX_LEN bytes."""
+    if len(prefix) < PREFIX_LEN or prefix[:len(MAGIC)] != MAGIC:
+        raise BundleError("not a CarGrader bundle")
+    (n,) = struct.unpack(">I", prefix[len(MAGIC):PREFIX_LEN])
+    return PREFIX_LEN + n
+
+def read_index(head: bytes) -> Tuple[int, Dict[str, list]]:
+    """(data_start, members) from a buffer holding at least the whole header."""
+    data_start = header_length(head)
+    if len(head) < data_start:
+        raise BundleError("truncated bundle header")
+    header = json.loads(head[PREFIX_LEN:data_start].decode("utf-8"))
+    if header.get("v") != 1:
+        raise BundleError(f"unsupported bundle version: {header.get('v')}")
+    return data_start, header["members"]
+
+def member_range(data_start: int, entry) -> Tuple[int, int]:
+    """Inclusive (start, end) byte range of a member, as used in a Range header."""
+    offset, length, _ = entry
+    return data_start + offset, data_start + offset + length - 1
+
+def decode_member(comp: bytes, entry) -> bytes:
+    raw = zlib.decompress(comp)
+    if len(raw) != entry[2]:
+        raise BundleError("bundle member length mismatch")
+    return raw
+
+def unpack_member(data: bytes, name: str) -> bytes:
+    """Extract one member from a fully downloaded bundle; KeyError if absent."""
+    data_start, members = read_index(data)
+    entry = members[name]
+    start, end = member_range(data_start, entry)
+    return decode_member(data[start:end + 1], entry)
@@ -0,0 +1,67 @@
+# Year -> Make -> Model tree for the dropdowns, built once per DB version.
+import json
+import re
+from app.db.connection import get_conn, per_db_version
+from app.db import queries
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+def _year_key(value):
+    """ModelYear as an int where possible, so lookups by ?year=2017 always match."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+def name_key(value):
+    """Make/Model as normalized catalogs key them (MakeKey, ModelKey): trimmed, lower-case, single spaces."""
+    if value is None:
+        return None
+    return re.sub(r"\s+", " ", str(value)).strip().lower()
+
+
+class Catalog:
+    """
+    Sorted year -> make -> [model] tree plus the JSON bodies the
+    /api/years, /api/makes and /api/models endpoints return, serialized once.
+    """
+
+    EMPTY_MAKES = _dumps({"makes": []})
+    EMPTY_MODELS = _dumps({"models": []})
+
+    def __init__(self, rows):
+        tree = {}
+        for r in rows:
+            year = _year_key(r["ModelYear"])
+            tree.setdefault(year, {}).setdefault(r["Make"], []).append(r["Model"])
+        self.tree = tree
+        self.years = list(tree)
+
+        self.years_json = _dumps({"years": self.years})
+        self._makes_json = {y: _dumps({"makes": list(makes)}) for y, makes in tree.items()}
+        self._models_json = {
+            (y, make): _dumps({"models": models})
+            for y, makes in tree.items()
+            for make, models in makes.items()
+        }
+
+    def makes_json(self, year) -> bytes:
+        return self._makes_json.get(year, self.EMPTY_MAKES)
+
+    def models_json(self, year, make) -> bytes:
+        return self._models_json.get((year, make), self.EMPTY_MODELS)
+
+
+@per_db_version
+def get_catalog() -> Catalog:
+    with get_conn(readonly=True) as con:
+        rows = con.execute(queries.CATALOG_SQL).fetchall()
+    return Catalog(rows)
+
+@per_db_version
+def allcars_columns() -> frozenset:
+    """Column names of AllCars in the current catalog (normalized files have more)."""
+    with get_conn(readonly=True) as con:
+        return frozenset(r["name"] for r in con.execute(queries.ALLCARS_COLUMNS_SQL))
@@ -0,0 +1,141 @@
+# Counts for /api/filter/facets from a per-version aggregate built once from
+# SNAPSHOT_SQL, so no request scans AllCars.
+#
+# Vehicles are grouped into (year, make) cells. Each cell keeps its vehicles'
+# best scores sorted, so a year/make/min_score filter is answered per cell
+# with bisect and never touches a vehicle. A models or max_score filter can
+# change which row is a vehicle's best, so those walk the vehicles of the
+# selected cells (still no rows, no SQL). Results are memoized per DB version
+# in the "facets" cache namespace. Catalogs whose ModelYear is not an integer
+# (un-normalized text years) get None and the SQL path.
+#
+# Same semantics as FILTER_FACETS_SQL_BASE: the score bounds filter rows,
+# each (year, make, model) counts once with MAX(Score) over its surviving rows.
+import math
+from bisect import bisect_left, bisect_right
+from typing import Optional
+from app.db.connection import get_conn, per_db_version
+from app.db import queries
+from app.utils import cache
+
+
+def _sort_key(value):
+    return (value is not None, value if value is not None else "")
+
+
+class Cell:
+    """The vehicles of one (year, make)."""
+
+    def __init__(self, vehicles: dict):
+        # model -> row scores, best first, NULLs dropped
+        self.vehicles = [(model, tuple(sorted(scores, reverse=True))) for model, scores in vehicles.items()]
+        self.unscored = sum(1 for _, scores in self.vehicles if not scores)
+        self.best = sorted(scores[0] for _, scores in self.vehicles if scores)
+        self._buckets = {}       # width -> bucket number of each self.best
+
+    def buckets(self, width) -> list:
+        ks = self._buckets.get(width)
+        if ks is None:
+            ks = self._buckets[width] = [math.floor(s / width) for s in self.best]
+        return ks
+
+
+class FacetIndex:
+    def __init__(self, rows):
+        by_cell = {}
+        for r in rows:
+            vehicles = by_cell.setdefault((r["ModelYear"], r["Make"]), {})
+            scores = vehicles.setdefault(r["Model"], [])
+            if r["Score"] is not None:
+                scores.append(r["Score"])
+        self.cells = {}
+        for (year, make), vehicles in by_cell.items():
+            self.cells.setdefault(year, {})[make] = Cell(vehicles)
+        self.years = sorted(self.cells)
+
+    def facets(self, width, min_year, max_year, makes=(), models=(), min_score=None, max_score=None) -> dict:
+        buckets, per_make, per_year = {}, {}, {}
+        total = unscored = 0
+        models = set(models)
+        lo, hi = bisect_left(self.years, min_year), bisect_right(self.years, max_year)
+        for year in self.years[lo:hi]:
+            cells = self.cells[year]
+            selected = [(m, cells[m]) for m in set(makes) if m in cells] if makes else cells.items()
+            for make, cell in selected:
+                if models or max_score is not None:
+                    n, none = self._walk(cell, width, buckets, models, min_score, max_score)
+                else:
+                    n, none = self._count(cell, width, buckets, min_score)
+                if n:
+                    total += n
+                    unscored += none
+                    per_make[make] = per_make.get(make, 0) + n
+                    per_year[year] = per_year.get(year, 0) + n
+        return {
+            "total": total,
+            "unscored": unscored,
+            "buckets": sorted((k * width, n) for k, n in buckets.items()),
+            "makes": sorted(per_make.items(), key=lambda kv: _sort_key(kv[0])),
+            "years": sorted(per_year.items()),
+        }
+
+    @staticmethod
+    def _count(cell, width, buckets, min_score):
+        """Every vehicle keeps its overall best score: count bucket runs by bisect."""
+        ks = cell.buckets(width)
+        i = 0 if min_score is None else bisect_left(cell.best, min_score)
+        n = len(ks) - i
+        while i < len(ks):
+            j = bisect_right(ks, ks[i], i)
+            buckets[ks[i]] = buckets.get(ks[i], 0) + j - i
+            i = j
+        if min_score is None:
+            return n + cell.unscored, cell.unscored
+        return n, 0
+
+    @staticmethod
+    def _walk(cell, width, buckets, models, min_score, max_score):
+        """A vehicle's best is its first score within the bounds, if any."""
+        n = none = 0
+        for model, scores in cell.vehicles:
+            if models and model not in models:
+                continue
+            best = next((s for s in scores if max_score is None or s <= max_score), None)
+            if best is not None and min_score is not None and best < min_score:
+                best = None
+            if best is None:
+                if min_score is not None or max_score is not None:
+                    continue  # every row filtered out, as in the SQL
+                none += 1
+            else:
+                k = math.floor(best / width)
+                buckets[k] = buckets.get(k, 0) + 1
+            n += 1
+        return n, none
+
+
+@per_db_version
+def get_facet_index() -> Optional[FacetIndex]:
+    with get_conn(readonly=True) as con:
+        rows = con.execute(queries.SNAPSHOT_SQL).fetchall()
+    for r in rows:
+        score = r["Score"]
+        if type(r["ModelYear"]) is not int or not (score is None or isinstance(score, (int, float))):
+            return None
+    return FacetIndex(rows)
+
+@cache.memoize("facets", max_entries=4096)
+def _facets(width, min_year, max_year, makes, models, min_score, max_score) -> Optional[dict]:
+    idx = get_facet_index()
+    if idx is None:
+        return None
+    return idx.facets(width, min_year, max_year, makes, models, min_score, max_score)
+
+def facets(width, min_year, max_year, makes=(), models=(), min_score=None, max_score=None) -> Optional[dict]:
+    """
+    {"total", "unscored", "buckets": [(low, n)], "makes": [(make, n)],
+    "years": [(year, n)]} over the vehicles /api/filter/search would match,
+    each counted once with its MAX(Score); None when the catalog has no index.
+    """
+    return _facets(width, min_year, max_year, tuple(sorted(set(makes))), tuple(sorted(set(models))),
+                   min_score, max_score)
@@ -1,44 +1,498 @@
-
 import os
-import io
-from typing import Optional, List, Dict
-import boto3
-from botocore.config import Config
-import botocore
-
-R2_BUCKET = os.environ["R2_BUCKET"]
-R2_ENDPOINT = os.environ["R2_ENDPOINT"]
-R2_ACCESS_KEY_ID = os.environ["R2_ACCESS_KEY_ID"]
-R2_SECRET_ACCESS_KEY = os.environ["R2_SECRET_ACCESS_KEY"]
-
-_session = boto3.session.Session()
-_s3 = _session.client(
-    "s3",
-    endpoint_url=R2_ENDPOINT,
-    aws_access_key_id=R2_ACCESS_KEY_ID,
-    aws_secret_access_key=R2_SECRET_ACCESS_KEY,
-    region_name="auto",
-    config=Config(
-        s3={"addressing_style": "virtual"},
-        signature_version="s3v4",
-        retries={"max_attempts": 3, "mode": "standard"},
-        connect_timeout=3,
-        read_timeout=10,
-    ),
-)
+import time
+import hashlib
+import tempfile
+import threading
+from typing import Optional, List, Dict, NamedTuple
+from app.utils import cache
+from app.utils import singleflight
+from . import bundles
+from . import storage
+
+# Read-through cache in front of R2. Artifacts only change when the data
+# pipeline republishes, so entries are served locally until their TTL runs
+# out and are then revalidated with If-None-Match (a 304 keeps the body).
+#   memory tier: per-process LRU bounded by bytes
+#   disk tier:   files under R2_CACHE_DIR, shared by every gunicorn worker
+R2_MEM_CACHE_MAX_BYTES = int(os.environ.get("R2_MEM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+R2_MEM_CACHE_TTL = float(os.environ.get("R2_MEM_CACHE_TTL", "600"))
+R2_CACHE_DIR = os.environ.get("R2_CACHE_DIR", os.path.join(tempfile.gettempdir(), "cargrader-r2"))
+R2_DISK_CACHE_MAX_BYTES = int(os.environ.get("R2_DISK_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+R2_DISK_CACHE_TTL = float(os.environ.get("R2_DISK_CACHE_TTL", str(6 * 3600)))
+
+# Missing objects (404) are remembered per key for R2_NEGATIVE_TTL seconds,
+# at most R2_NEGATIVE_MAX_ENTRIES of them per process, and only for group
+# artifact keys (bundles.is_artifact_key); any other key always goes to origin.
+# The pipeline rewrites R2_DATA_VERSION_KEY whenever it republishes; when
+# its ETag changes every remembered miss is dropped and cached bodies are
+# revalidated. Checked at most once per R2_VERSION_CHECK_INTERVAL.
+R2_NEGATIVE_TTL = float(os.environ.get("R2_NEGATIVE_TTL", "3600"))
+R2_NEGATIVE_MAX_ENTRIES = int(os.environ.get("R2_NEGATIVE_MAX_ENTRIES", "8192"))
+R2_DATA_VERSION_KEY = os.environ.get("R2_DATA_VERSION_KEY", "ResourceFiles/VERSION")
+R2_VERSION_CHECK_INTERVAL = float(os.environ.get("R2_VERSION_CHECK_INTERVAL", "60"))
+
+# How packed per-group bundles are read (see app.services.bundles):
+#   whole: one GET for the whole bundle, cached like any other object
+#   range: header + member via HTTP Range requests
+#   off:   ignore bundles and read the individual objects
+R2_BUNDLE_MODE = os.environ.get("R2_BUNDLE_MODE", "whole").lower()
+
+# The object store itself is chosen by STORAGE_BACKEND (see app.services.storage)
+# and created on first use, so importing this module needs no credentials.
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> storage.StorageBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = storage.backend_from_env()
+    return _backend
+
+def set_backend(backend: storage.StorageBackend):
+    """Swap the object store (tests, benchmarks) and drop this process's cached reads."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    _mem.clear()
+    _negative.clear()
 
 class R2Error(Exception):
     pass
 
+class BundleMissing(R2Error):
+    """No bundle for this group; callers fall back to the individual objects."""
+    pass
+
+class MemberMissing(BundleMissing):
+    """The bundle exists but lacks this member (e.g. published after packing)."""
+    pass
+
+
+class _Entry(NamedTuple):
+    body: bytes
+    etag: Optional[str]
+    fetched_at: float
+
+
+class _DiskCache:
+    """
+    One file per key: the ETag on the first line, then the body. The file's
+    mtime is the fetch time, so a revalidation only needs os.utime(). Writes
+    go through a temp file + os.replace so concurrent workers never read a
+    partial file. Remembered 404s are "<file>.404" markers that expire after
+    missing_ttl seconds.
+    """
+
+    PRUNE_EVERY = 256   # writes between size checks
+    TMP_GRACE = 300     # seconds before a .tmp file counts as abandoned
+
+    def __init__(self, root, max_bytes, missing_ttl: Optional[float] = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.missing_ttl = missing_ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "expired": 0, "errors": 0}
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        h = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, h[:2], h)
+
+    def get(self, key) -> Optional[_Entry]:
+        if not self.root:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                etag = f.readline().rstrip(b"\n").decode("ascii") or None
+                body = f.read()
+            return _Entry(body, etag, os.path.getmtime(path))
+        except FileNotFoundError:
+            return None
+        except OSError:
+            self.stats["errors"] += 1
+            return None
+
+    def put(self, key, entry: _Entry):
+        if not self.root:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write((entry.etag or "").encode("ascii", errors="ignore") + b"\n")
+                f.write(entry.body)
+            os.replace(tmp, path)
+        except OSError:
+            self.stats["errors"] += 1
+            return
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def discard(self, key):
+        if self.root:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def get_missing(self, key) -> Optional[tuple]:
+        """(data version, recorded_at) of a remembered 404, or None."""
+        if not self.root:
+            return None
+        path = self._path(key) + ".404"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                version = f.read() or None
+            return version, os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def put_missing(self, key, version: Optional[str]):
+        if not self.root:
+            return
+        path = self._path(key) + ".404"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(version or "")
+            os.replace(tmp, path)
+        except OSError:
+            self.stats["errors"] += 1
+
+    def discard_missing(self, key):
+        if self.root:
+            try:
+                os.remove(self._path(key) + ".404")
+            except OSError:
+                pass
+
+    def touch(self, key):
+        if self.root:
+            try:
+                os.utime(self._path(key))
+            except OSError:
+                pass
+
+    def _remove(self, path, stat: str) -> bool:
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        self.stats[stat] += 1
+        return True
+
+    def prune(self):
+        """
+        Delete least recently fetched bodies until the tier fits max_bytes.
+        .404 markers go only once missing_ttl has passed, and .tmp files only
+        when older than TMP_GRACE (another worker may still be writing them).
+        """
+        now = time.time()
+        files = []
+        for dirpath, _, names in os.walk(self.root):
+            for n in names:
+                p = os.path.join(dirpath, n)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                if n.endswith(".tmp"):
+                    if now - st.st_mtime > self.TMP_GRACE:
+                        self._remove(p, "expired")
+                    continue
+                if n.endswith(".404"):
+                    if self.missing_ttl is not None and now - st.st_mtime >= self.missing_ttl:
+                        self._remove(p, "expired")
+                    continue
+                files.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in files)
+        for _, size, p in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if self._remove(p, "evictions"):
+                total -= size
+
+    def info(self):
+        return {"dir": self.root, "max_bytes": self.max_bytes, **self.stats}
+
+
+# memory tier: the "r2" namespace of app.utils.cache; an entry expires
+# R2_MEM_CACHE_TTL after it was fetched, however it got into memory
+_mem = cache.namespace("r2", max_entries=None, max_bytes=R2_MEM_CACHE_MAX_BYTES,
+                       sizeof=lambda e: len(e.body))
+_disk = _DiskCache(R2_CACHE_DIR, R2_DISK_CACHE_MAX_BYTES, R2_NEGATIVE_TTL)
+_no_disk = _DiskCache(None, 0)
+
+def _disk_tier() -> _DiskCache:
+    # a local backend is already on disk; copying its files again gains nothing
+    return _no_disk if get_backend().is_local else _disk
+_origin_stats = {"fetches": 0, "not_modified": 0}
+
+# key -> (data version, recorded_at), LRU-bounded like the memory tier
+_negative = cache.namespace("r2-missing", max_entries=R2_NEGATIVE_MAX_ENTRIES,
+                            ttl=R2_NEGATIVE_TTL)
+_negative_stats = {"hits": 0, "stored": 0, "invalidations": 0}
+
+# Last seen ETag of R2_DATA_VERSION_KEY, and when we noticed it change;
+# cached bodies fetched before that moment are revalidated on next read.
+_data_version = {"etag": None, "published_at": 0.0, "checked_at": 0.0}
+_version_lock = threading.Lock()
+
+
+def _fetch(key: str, etag: Optional[str] = None):
+    """GET from the store; raises storage.NotModified if etag still matches, R2Error if missing."""
+    try:
+        body, new_etag = get_backend().get(key, if_none_match=etag)
+    except storage.NotModified:
+        _origin_stats["not_modified"] += 1
+        raise
+    except storage.ObjectNotFound as e:
+        raise R2Error(f"Object not found: {key}") from e
+    _origin_stats["fetches"] += 1
+    return body, new_etag
+
+def _fetch_range(key: str, start: int, end: int, if_match: Optional[str] = None):
+    """Inclusive byte range; storage.PreconditionFailed if the ETag is no longer if_match."""
+    try:
+        body, etag = get_backend().get(key, byte_range=(start, end), if_match=if_match)
+    except storage.ObjectNotFound as e:
+        raise R2Error(f"Object not found: {key}") from e
+    _origin_stats["fetches"] += 1
+    return body, etag
+
+def invalidate_negative():
+    """Forget every remembered 404 (e.g. after new artifacts were published)."""
+    _negative.clear()
+    _negative_stats["invalidations"] += 1
+
+def note_data_published(etag: Optional[str] = None):
+    """Record a new data version: drop remembered misses, revalidate cached bodies."""
+    with _version_lock:
+        _data_version["etag"] = etag
+        _data_version["published_at"] = time.time()
+    invalidate_negative()
+
+def _check_data_version(now: float):
+    if not R2_DATA_VERSION_KEY or now - _data_version["checked_at"] < R2_VERSION_CHECK_INTERVAL:
+        return
+    # one thread per process does the check; the others carry on
+    if not _version_lock.acquire(blocking=False):
+        return
+    try:
+        first = _data_version["checked_at"] == 0.0
+        _data_version["checked_at"] = now
+        seen = _data_version["etag"]
+        try:
+            _, etag = _fetch(R2_DATA_VERSION_KEY, seen)
+        except storage.NotModified:
+            return
+        except R2Error:
+            etag = None
+        except Exception:
+            return  # R2 unreachable: keep serving what we have
+    finally:
+        _version_lock.release()
+    if first:
+        # first check in this process: just remember the version
+        _data_version["etag"] = etag
+    elif etag != seen:
+        note_data_published(etag)
+
+def _is_fresh(fetched_at: float, now: float, ttl: float) -> bool:
+    return now - fetched_at < ttl and fetched_at >= _data_version["published_at"]
+
+def _mem_get(key: str) -> Optional[_Entry]:
+    entry = _mem.get(key)
+    if entry is not None and entry.fetched_at < _data_version["published_at"]:
+        _mem.delete(key)
+        return None
+    return entry
+
+def _mem_put(key: str, entry: _Entry, now: float):
+    ttl = R2_MEM_CACHE_TTL - (now - entry.fetched_at)
+    if ttl > 0:
+        _mem.set(key, entry, ttl=ttl)
+
+def _known_missing(key: str, now: float) -> bool:
+    if not bundles.is_artifact_key(key):
+        return False
+    disk = _disk_tier()
+    version = _data_version["etag"]
+    hit = _negative.get(key)
+    if hit is None:
+        hit = disk.get_missing(key)
+        if hit is None:
+            return False
+    if hit[0] != version or not _is_fresh(hit[1], now, R2_NEGATIVE_TTL):
+        _negative.delete(key)
+        return False
+    _negative.set(key, hit, ttl=R2_NEGATIVE_TTL - (now - hit[1]))
+    return True
+
+def _remember_missing(key: str, now: float):
+    disk = _disk_tier()
+    if bundles.is_artifact_key(key):
+        version = _data_version["etag"]
+        _negative.set(key, (version, now))
+        _negative_stats["stored"] += 1
+        disk.put_missing(key, version)
+    _mem.delete(key)
+    disk.discard(key)
+
+# Concurrent misses on the same key share one disk read / origin fetch.
+_flights = singleflight.group("r2")
+
 def get_bytes(key: str) -> bytes:
+    now = time.time()
+    _check_data_version(now)
+
+    entry = _mem_get(key)
+    if entry is not None:
+        return entry.body
+    return _flights.do(key, _load, key, now)
+
+def _load(key: str, now: float) -> bytes:
+    disk = _disk_tier()
+    if _known_missing(key, now):
+        _negative_stats["hits"] += 1
+        raise R2Error(f"Object not found: {key}")
+
+    disk_entry = disk.get(key)
+    if disk_entry is not None:
+        if _is_fresh(disk_entry.fetched_at, now, R2_DISK_CACHE_TTL):
+            disk.stats["hits"] += 1
+            _mem_put(key, disk_entry, now)
+            return disk_entry.body
+        disk.stats["stale"] += 1
+    else:
+        disk.stats["misses"] += 1
+
+    stale = disk_entry
     try:
-        resp = _s3.get_object(Bucket=R2_BUCKET, Key=key)
-        return resp["Body"].read()
-    except botocore.exceptions.ClientError as e:
-        code = e.response.get("Error", {}).get("Code")
-        if code in ("NoSuchKey", "404"):
-            raise R2Error(f"Object not found: {key}") from e
+        body, etag = _fetch(key, stale.etag if stale is not None else None)
+    except R2Error:
+        _remember_missing(key, now)
         raise
+    except storage.NotModified:
+        fresh = stale._replace(fetched_at=now)
+        disk.touch(key)
+        _mem_put(key, fresh, now)
+        return fresh.body
+
+    fresh = _Entry(body, etag, now)
+    disk.discard_missing(key)
+    disk.put(key, fresh)
+    _mem_put(key, fresh, now)
+    return body
 
 def get_text(key: str, encoding: str = "utf-8") -> str:
     return get_bytes(key).decode(encoding, errors="replace")
+
+def _bundle_head(key: str, now: float, refresh: bool = False) -> _Entry:
+    """The bundle's header bytes (magic + length + JSON), cached in the memory tier."""
+    cache_key = f"{key}#header"
+    entry = None if refresh else _mem_get(cache_key)
+    if entry is not None:
+        return entry
+    return _flights.do(cache_key, _load_bundle_head, key, cache_key, now)
+
+def _load_bundle_head(key: str, cache_key: str, now: float) -> _Entry:
+    if _known_missing(key, now):
+        raise BundleMissing(f"Object not found: {key}")
+    try:
+        head, etag = _fetch_range(key, 0, bundles.HEADER_PROBE_BYTES - 1)
+    except R2Error:
+        _remember_missing(key, now)
+        raise BundleMissing(f"Object not found: {key}")
+    need = bundles.header_length(head)
+    if len(head) < need:
+        rest, _ = _fetch_range(key, len(head), need - 1, if_match=etag)
+        head += rest
+    entry = _Entry(head[:need], etag, now)
+    _mem_put(cache_key, entry, now)
+    return entry
+
+def get_bundle_member(group_id, name: str) -> bytes:
+    """
+    One member of ResourceFiles/{group_id}/{group_id}.bundle. Raises
+    BundleMissing if the group has no bundle and MemberMissing (a
+    BundleMissing) if the bundle exists but lacks the member, so callers
+    fall back to ResourceFiles/{group_id}/{name} either way.
+    """
+    key = bundles.bundle_key(group_id)
+    if R2_BUNDLE_MODE == "off":
+        raise BundleMissing(f"Bundles disabled: {key}")
+    if R2_BUNDLE_MODE != "range":
+        try:
+            data = get_bytes(key)
+        except R2Error as e:
+            raise BundleMissing(str(e)) from e
+        try:
+            return bundles.unpack_member(data, name)
+        except KeyError:
+            raise MemberMissing(f"Object not found: {key}#{name}")
+
+    now = time.time()
+    _check_data_version(now)
+    for attempt in range(2):
+        head = _bundle_head(key, now, refresh=attempt > 0)
+        data_start, members = bundles.read_index(head.body)
+        entry = members.get(name)
+        if entry is None:
+            raise MemberMissing(f"Object not found: {key}#{name}")
+
+        cache_key = f"{key}#{name}"
+        cached = _mem_get(cache_key)
+        if cached is not None and cached.etag == head.etag:
+            return cached.body
+        try:
+            return _flights.do((cache_key, head.etag), _load_bundle_member,
+                               key, cache_key, data_start, entry, head.etag, now)
+        except storage.PreconditionFailed:
+            continue  # bundle republished since we read its header
+    raise R2Error(f"Bundle kept changing while reading: {key}")
+
+def _load_bundle_member(key, cache_key, data_start, entry, etag, now) -> bytes:
+    start, end = bundles.member_range(data_start, entry)
+    comp, _ = _fetch_range(key, start, end, if_match=etag)
+    raw = bundles.decode_member(comp, entry)
+    _mem_put(cache_key, _Entry(raw, etag, now), now)
+    return raw
+
+def list_objects(prefix: str) -> List[Dict]:
+    """[{"key", "etag", "size"}] for every object under prefix."""
+    return get_backend().list(prefix)
+
+def list_keys(prefix: str) -> List[str]:
+    return [o["key"] for o in list_objects(prefix)]
+
+def put_bytes(key: str, data: bytes, content_type: str = "application/octet-stream"):
+    get_backend().put(key, data, content_type=content_type)
+
+def cache_stats() -> Dict[str, dict]:
+    info = _negative.info()
+    negative = {"entries": info["entries"], "max_entries": info["max_entries"],
+                "evictions": info["evictions"], **_negative_stats}
+    return {
+        "backend": get_backend().name,
+        "memory": _mem.info(),
+        "disk": _disk_tier().info(),
+        "negative": negative,
+        "origin": dict(_origin_stats),
+        "data_version": _data_version["etag"],
+        "in_flight": _flights.info(),
+    }
+
+def clear_cache():
+    """Drop this process's memory tier; the disk tier revalidates by ETag."""
+    _mem.clear()
@@ -0,0 +1,166 @@
+# Columnar in-memory copy of AllCars for /api/filter/search, built once per
+# DB version. Needs numpy (optional dependency); without it, or with
+# FILTER_SNAPSHOT=0, or when the catalog has non-integer years, search()
+# returns None and the route runs FILTER_SEARCH_SQL_BASE as before.
+# /api/filter/facets has its own aggregate (app.services.facets).
+#
+# Same semantics as the SQL: the score bounds filter rows, each
+# (year, make, model) reports MAX(Score) over its surviving rows, ordered
+# (Score IS NULL), Score DESC, Year DESC, Make, Model.
+from bisect import bisect_left
+from typing import List, Optional
+from flask import current_app
+from app.db.connection import get_conn, per_db_version
+from app.db import queries
+
+try:
+    import numpy as np
+except ImportError:  # optional
+    np = None
+
+
+def _sort_key(value):
+    # SQLite orders NULL first, then text by bytes (= code points)
+    return (value is not None, value if value is not None else "")
+
+
+class Snapshot:
+    """
+    Row arrays sorted by vehicle, best score first within a vehicle (NULL
+    last), so the first surviving row of a vehicle carries its MAX(Score).
+    Makes/models are dictionary-encoded with codes in sort order.
+    """
+
+    def __init__(self, rows):
+        makes = sorted({r["Make"] for r in rows}, key=_sort_key)
+        models = sorted({r["Model"] for r in rows}, key=_sort_key)
+        self.makes = makes
+        self.models = models
+        self.make_ids = {m: i for i, m in enumerate(makes)}
+        self.model_ids = {m: i for i, m in enumerate(models)}
+
+        year = np.array([r["ModelYear"] for r in rows], dtype=np.int32)
+        make = np.array([self.make_ids[r["Make"]] for r in rows], dtype=np.int32)
+        model = np.array([self.model_ids[r["Model"]] for r in rows], dtype=np.int32)
+        score = np.array([np.nan if r["Score"] is None else r["Score"] for r in rows], dtype=np.float64)
+
+        # vehicles in output tie-break order: Year DESC, Make, Model
+        order = np.lexsort((model, make, -year.astype(np.int64)))
+        key = np.stack([year[order], make[order], model[order]], axis=1)
+        if len(order):
+            new = np.r_[True, np.any(key[1:] != key[:-1], axis=1)]
+        else:
+            new = np.zeros(0, dtype=bool)
+        vid_sorted = np.cumsum(new) - 1
+        vehicle = np.empty(len(order), dtype=np.int32)
+        vehicle[order] = vid_sorted
+        self.v_year = year[order][new]
+        self.v_make = make[order][new]
+        self.v_model = model[order][new]
+
+        # rows grouped by vehicle, highest score first, NULL scores last
+        score_key = np.where(np.isnan(score), np.inf, -score)
+        rows_order = np.lexsort((score_key, vehicle))
+        self.year = year[rows_order]
+        self.make = make[rows_order]
+        self.model = model[rows_order]
+        self.score = score[rows_order]
+        self.vehicle = vehicle[rows_order]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.year, self.make, self.model, self.score, self.vehicle))
+
+    def _ids(self, names, ids):
+        return np.fromiter((ids[n] for n in names if n in ids), dtype=np.int32)
+
+    def mask(self, min_year, max_year, makes=(), models=(), min_score=None, max_score=None):
+        m = (self.year >= min_year) & (self.year <= max_year)
+        if makes:
+            m &= np.isin(self.make, self._ids(makes, self.make_ids))
+        if models:
+            m &= np.isin(self.model, self._ids(models, self.model_ids))
+        # comparisons with NaN are False, like SQL comparisons with NULL
+        if min_score is not None:
+            m &= self.score >= min_score
+        if max_score is not None:
+            m &= self.score <= max_score
+        return m
+
+    def vehicles(self, mask):
+        """(vehicle ids, MAX(Score) per vehicle) for the rows left by mask."""
+        idx = np.flatnonzero(mask)
+        if not len(idx):
+            return idx, np.zeros(0)
+        v = self.vehicle[idx]
+        first = np.r_[True, v[1:] != v[:-1]]
+        return v[first], self.score[idx[first]]
+
+    def _code_cmp(self, names, codes, value):
+        """(codes > value, codes == value) with value compared by name, known or not."""
+        pos = bisect_left(names, _sort_key(value), key=_sort_key)
+        exact = pos < len(names) and names[pos] == value
+        return (codes > pos) if exact else (codes >= pos), (codes == pos) if exact else np.zeros(len(codes), dtype=bool)
+
+    def _after(self, vids, best, after):
+        """Mask of vehicles sorting strictly after the cursor key (score, year, make, model)."""
+        score, year, make, model = after
+        mk_gt, mk_eq = self._code_cmp(self.makes, self.v_make[vids], make)
+        md_gt, md_eq = self._code_cmp(self.models, self.v_model[vids], model)
+        y = self.v_year[vids]
+        tie = (y < year) | ((y == year) & (mk_gt | (mk_eq & md_gt)))
+        if score is None:
+            return np.isnan(best) & tie
+        return np.isnan(best) | (best < score) | ((best == score) & tie)
+
+    def search(self, limit, after=None, **filters) -> List[dict]:
+        vids, best = self.vehicles(self.mask(**filters))
+        if after is not None and len(vids):
+            keep = self._after(vids, best, after)
+            vids, best = vids[keep], best[keep]
+        if len(vids) > limit:
+            # top-k by score; keep every tie at the cut, then order exactly
+            key = np.where(np.isnan(best), np.inf, -best)
+            kth = key[np.argpartition(key, limit - 1)[limit - 1]]
+            keep = np.flatnonzero(key <= kth)
+            vids, best, key = vids[keep], best[keep], key[keep]
+        else:
+            key = np.where(np.isnan(best), np.inf, -best)
+        # vehicle ids already follow Year DESC, Make, Model
+        top = np.lexsort((vids, key))[:limit]
+        return [
+            {
+                "year": int(self.v_year[v]),
+                "make": self.makes[self.v_make[v]],
+                "model": self.models[self.v_model[v]],
+                "score": None if np.isnan(s) else float(s),
+            }
+            for v, s in zip(vids[top], best[top])
+        ]
+
+
+def enabled() -> bool:
+    return np is not None and current_app.config.get("FILTER_SNAPSHOT", True)
+
+@per_db_version
+def get_snapshot() -> Optional[Snapshot]:
+    with get_conn(readonly=True) as con:
+        rows = con.execute(queries.SNAPSHOT_SQL).fetchall()
+    for r in rows:
+        score = r["Score"]
+        if type(r["ModelYear"]) is not int or not (score is None or isinstance(score, (int, float))):
+            current_app.logger.info("filter snapshot disabled: AllCars has non-integer years or scores")
+            return None
+    return Snapshot(rows)
+
+def search(limit, after=None, **filters) -> Optional[List[dict]]:
+    """
+    Rows for /api/filter/search, or None when the snapshot is unavailable.
+    after=(score, year, make, model) of the previous page's last row.
+    """
+    if not enabled():
+        return None
+    snap = get_snapshot()
+    if snap is None:
+        return None
+    return snap.search(limit, after=after, **filters)
@@ -0,0 +1,234 @@
+# Object-storage backends behind app.services.r2.
+#
+#   STORAGE_BACKEND=r2      Cloudflare R2 via boto3 (default; needs the R2_* env vars)
+#   STORAGE_BACKEND=local   a directory laid out like the bucket (STORAGE_LOCAL_DIR)
+#   STORAGE_BACKEND=memory  an in-process dict, for tests and benchmarks
+#
+# Every backend speaks the same small interface, so the caching, bundle and
+# artifact code above it runs unchanged whichever one is configured.
+import abc
+import os
+import hashlib
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class StorageError(Exception):
+    pass
+
+class ObjectNotFound(StorageError):
+    pass
+
+class NotModified(StorageError):
+    """Conditional GET: the object still has the ETag passed as if_none_match."""
+    pass
+
+class PreconditionFailed(StorageError):
+    """Conditional GET: the object no longer has the ETag passed as if_match."""
+    pass
+
+
+class StorageBackend(abc.ABC):
+    name = "base"
+    # True when reads are already local, so a disk cache tier would only copy files
+    is_local = False
+
+    @abc.abstractmethod
+    def get(self, key: str, if_none_match: Optional[str] = None,
+            byte_range: Optional[Tuple[int, int]] = None,
+            if_match: Optional[str] = None) -> Tuple[bytes, Optional[str]]:
+        """(body, etag). byte_range is an inclusive (start, end)."""
+
+    @abc.abstractmethod
+    def list(self, prefix: str) -> List[Dict]:
+        """[{"key", "etag", "size"}] for every object under prefix."""
+
+    @abc.abstractmethod
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None) -> Optional[str]:
+        """Store data under key; returns the new ETag when the backend reports one."""
+
+
+def _check_conditions(etag, if_none_match, if_match):
+    if if_none_match and if_none_match == etag:
+        raise NotModified()
+    if if_match and if_match != etag:
+        raise PreconditionFailed()
+
+def _slice(body: bytes, byte_range):
+    if byte_range is None:
+        return body
+    start, end = byte_range
+    return body[start:end + 1]
+
+
+class R2Backend(StorageBackend):
+    name = "r2"
+
+    def __init__(self, bucket, endpoint, access_key_id, secret_access_key):
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self._client = boto3.session.Session().client(
+            "s3",
+            endpoint_url=endpoint,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            region_name="auto",
+            config=Config(
+                s3={"addressing_style": "virtual"},
+                signature_version="s3v4",
+                retries={"max_attempts": 3, "mode": "standard"},
+                connect_timeout=3,
+                read_timeout=10,
+            ),
+        )
+
+    @classmethod
+    def from_env(cls):
+        missing = [v for v in ("R2_BUCKET", "R2_ENDPOINT", "R2_ACCESS_KEY_ID", "R2_SECRET_ACCESS_KEY")
+                   if not os.environ.get(v)]
+        if missing:
+            raise StorageError(f"STORAGE_BACKEND=r2 needs {', '.join(missing)}")
+        return cls(os.environ["R2_BUCKET"], os.environ["R2_ENDPOINT"],
+                   os.environ["R2_ACCESS_KEY_ID"], os.environ["R2_SECRET_ACCESS_KEY"])
+
+    def get(self, key, if_none_match=None, byte_range=None, if_match=None):
+        import botocore
+
+        params = {"Bucket": self.bucket, "Key": key}
+        if if_none_match:
+            params["IfNoneMatch"] = if_none_match
+        if if_match:
+            params["IfMatch"] = if_match
+        if byte_range is not None:
+            params["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+        try:
+            resp = self._client.get_object(**params)
+            return resp["Body"].read(), resp.get("ETag")
+        except botocore.exceptions.ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("304", "NotModified"):
+                raise NotModified() from e
+            if code in ("412", "PreconditionFailed"):
+                raise PreconditionFailed() from e
+            if code in ("NoSuchKey", "404"):
+                raise ObjectNotFound(key) from e
+            raise StorageError(f"R2 GetObject {key} failed: {code}") from e
+
+    def list(self, prefix):
+        out = []
+        paginator = self._client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                out.append({"key": obj["Key"], "etag": obj.get("ETag"), "size": obj.get("Size")})
+        return out
+
+    def put(self, key, data, content_type=None):
+        resp = self._client.put_object(Bucket=self.bucket, Key=key, Body=data,
+                                       ContentType=content_type or "application/octet-stream")
+        return resp.get("ETag")
+
+
+class LocalBackend(StorageBackend):
+    """Objects are files under root; the ETag is derived from mtime and size."""
+    name = "local"
+    is_local = True
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root, *key.split("/")))
+        if not path.startswith(self.root + os.sep):
+            raise ObjectNotFound(key)
+        return path
+
+    @staticmethod
+    def _etag(st):
+        return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+    def get(self, key, if_none_match=None, byte_range=None, if_match=None):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                etag = self._etag(os.fstat(f.fileno()))
+                _check_conditions(etag, if_none_match, if_match)
+                if byte_range is None:
+                    return f.read(), etag
+                f.seek(byte_range[0])
+                return f.read(byte_range[1] - byte_range[0] + 1), etag
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError) as e:
+            raise ObjectNotFound(key) from e
+
+    def list(self, prefix):
+        out = []
+        for dirpath, _, names in os.walk(self.root):
+            for n in names:
+                path = os.path.join(dirpath, n)
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    st = os.stat(path)
+                    out.append({"key": key, "etag": self._etag(st), "size": st.st_size})
+        out.sort(key=lambda o: o["key"])
+        return out
+
+    def put(self, key, data, content_type=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return self._etag(os.stat(path))
+
+
+class MemoryBackend(StorageBackend):
+    name = "memory"
+    is_local = True
+
+    def __init__(self, objects: Optional[Dict[str, bytes]] = None):
+        self._objects = {}
+        self._lock = threading.Lock()
+        for key, data in (objects or {}).items():
+            self.put(key, data)
+
+    def get(self, key, if_none_match=None, byte_range=None, if_match=None):
+        with self._lock:
+            hit = self._objects.get(key)
+        if hit is None:
+            raise ObjectNotFound(key)
+        body, etag = hit
+        _check_conditions(etag, if_none_match, if_match)
+        return _slice(body, byte_range), etag
+
+    def list(self, prefix):
+        with self._lock:
+            items = sorted(self._objects.items())
+        return [{"key": k, "etag": etag, "size": len(body)}
+                for k, (body, etag) in items if k.startswith(prefix)]
+
+    def put(self, key, data, content_type=None):
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        with self._lock:
+            self._objects[key] = (bytes(data), etag)
+        return etag
+
+    def delete(self, key):
+        with self._lock:
+            self._objects.pop(key, None)
+
+
+def backend_from_env() -> StorageBackend:
+    kind = os.environ.get("STORAGE_BACKEND", "r2").lower()
+    if kind == "r2":
+        return R2Backend.from_env()
+    if kind == "local":
+        root = os.environ.get("STORAGE_LOCAL_DIR")
+        if not root:
+            raise StorageError("STORAGE_BACKEND=local needs STORAGE_LOCAL_DIR")
+        return LocalBackend(root)
+    if kind == "memory":
+        return MemoryBackend()
+    raise StorageError(f"unknown STORAGE_BACKEND: {kind}")
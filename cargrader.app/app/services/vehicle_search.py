@@ -0,0 +1,154 @@
+# Typeahead over make/model names for /api/search, built once per DB version
+# from the vehicle index (no extra query).
+#
+# Names are normalized to lower-case alphanumeric terms, each word plus the
+# whole name without separators ("F-150" -> "f", "150", "f150"), so "f150",
+# "f-15" and "civic" all match. Terms sit in one sorted list searched with
+# bisect for prefixes; a trigram index over the same terms catches typos
+# ("camery") when a query word has no prefix match.
+import re
+from array import array
+from bisect import bisect_left
+from typing import List, NamedTuple
+from app.db.connection import per_db_version
+from app.services.vehicles import get_index
+
+EXACT, PREFIX, FUZZY = 3.0, 2.0, 1.0
+FUZZY_MIN_SIMILARITY = 0.4
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def words(text) -> list:
+    return _WORD.findall(str(text).lower()) if text is not None else []
+
+def name_terms(text) -> set:
+    parts = words(text)
+    terms = set(parts)
+    if len(parts) > 1:
+        terms.add("".join(parts))
+    return terms
+
+def trigrams(term: str) -> set:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Entry(NamedTuple):
+    make: str
+    model: str
+    years: tuple           # newest first
+    scores: tuple          # best score per year, same order
+
+
+class SearchIndex:
+    def __init__(self, vehicles: dict):
+        by_name = {}
+        for (year, make, model), v in vehicles.items():
+            if type(year) is not int or make is None or model is None:
+                continue
+            by_name.setdefault((make, model), []).append((year, v.score))
+        self.entries = []
+        term_entries = {}
+        for (make, model), rows in sorted(by_name.items()):
+            rows.sort(reverse=True)
+            eid = len(self.entries)
+            self.entries.append(Entry(make, model, tuple(y for y, _ in rows), tuple(s for _, s in rows)))
+            for t in name_terms(make) | name_terms(model) | name_terms(f"{make} {model}"):
+                term_entries.setdefault(t, []).append(eid)
+
+        # sorted terms for prefix search, each with the entries it names
+        self.terms = sorted(term_entries)
+        self.postings = [array("I", term_entries[t]) for t in self.terms]
+        grams = {}
+        for tid, t in enumerate(self.terms):
+            for g in trigrams(t):
+                grams.setdefault(g, array("I")).append(tid)
+        self.grams = grams
+        self._gram_counts = array("H", (len(trigrams(t)) for t in self.terms))
+
+    def _prefix(self, word: str) -> dict:
+        """{entry id: quality} for terms starting with word."""
+        out = {}
+        i = bisect_left(self.terms, word)
+        while i < len(self.terms) and self.terms[i].startswith(word):
+            q = EXACT if self.terms[i] == word else PREFIX
+            for eid in self.postings[i]:
+                if out.get(eid, 0) < q:
+                    out[eid] = q
+            i += 1
+        return out
+
+    def _fuzzy(self, word: str) -> dict:
+        """{entry id: quality} for terms sharing enough trigrams with word."""
+        grams = trigrams(word)
+        shared = {}
+        for g in grams:
+            for tid in self.grams.get(g, ()):
+                shared[tid] = shared.get(tid, 0) + 1
+        out = {}
+        for tid, n in shared.items():
+            sim = n / (len(grams) + self._gram_counts[tid] - n)
+            if sim >= FUZZY_MIN_SIMILARITY:
+                for eid in self.postings[tid]:
+                    q = FUZZY * sim
+                    if out.get(eid, 0) < q:
+                        out[eid] = q
+        return out
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        year = None
+        text = []
+        for w in words(query):
+            if len(w) == 4 and w.isdigit() and 1900 <= int(w) <= 2100 and year is None:
+                year = int(w)
+            else:
+                text.append(w)
+
+        if text:
+            # every word has to match; an entry's quality is the sum over words
+            quality = None
+            for w in text:
+                hits = self._prefix(w) or self._fuzzy(w)
+                if quality is None:
+                    quality = hits
+                else:
+                    quality = {e: q + hits[e] for e, q in quality.items() if e in hits}
+                if not quality:
+                    break
+            if len(text) > 1:
+                # "f-15", "rav 4": the words run together may name one term
+                for e, q in self._prefix("".join(text)).items():
+                    quality[e] = max(quality.get(e, 0), q * len(text))
+            if not quality:
+                return []
+        else:
+            if year is None:
+                return []
+            quality = {eid: 0.0 for eid in range(len(self.entries))}
+
+        results = []
+        for eid, q in quality.items():
+            e = self.entries[eid]
+            if year is None:
+                y, score = e.years[0], e.scores[0]
+            elif year in e.years:
+                k = e.years.index(year)
+                y, score = year, e.scores[k]
+            else:
+                continue
+            results.append((q, score, y, e, eid))
+        results.sort(key=lambda r: (-r[0], r[1] is None, -(r[1] or 0), r[3].make, r[3].model))
+        return [
+            {"year": y, "make": e.make, "model": e.model, "score": score,
+             "years": list(e.years), "match": round(q, 3)}
+            for q, score, y, e, _ in results[:limit]
+        ]
+
+
+@per_db_version
+def get_search_index() -> SearchIndex:
+    return SearchIndex(get_index())
+
+def search(query: str, limit: int = 10) -> List[dict]:
+    return get_search_index().search(query, limit)
@@ -0,0 +1,74 @@
+# (year, make, model) -> GroupID/Score resolution, built once per DB version.
+from typing import NamedTuple, Optional
+from app.db.connection import get_conn, per_db_version
+from app.db import queries
+from app.services.catalog import _year_key
+
+
+class Vehicle(NamedTuple):
+    group_id: Optional[int]
+    score: Optional[float]
+    certainty: Optional[float]
+    rel_ratio: Optional[float]
+    complaint_count: Optional[int]
+
+
+def build_index(rows):
+    """
+    Keep the best-scored row per (year, make, model), matching the old
+    ORDER BY (Score IS NULL), Score DESC LIMIT 1 lookups. ComplaintCount is
+    SUM(Count) over that vehicle's rows sharing the chosen GroupID/RelRatio,
+    as DETAILS_SQL's GROUP BY computed it.
+    """
+    index = {}
+    key = best = None
+    total = None
+
+    def _flush():
+        if key is not None:
+            index[key] = best._replace(complaint_count=total)
+
+    for r in rows:
+        k = (_year_key(r["ModelYear"]), r["Make"], r["Model"])
+        if k != key:
+            _flush()
+            key = k
+            best = Vehicle(r["GroupID"], r["Score"], r["Certainty"], r["RelRatio"], None)
+            total = None
+        if r["GroupID"] != best.group_id or r["RelRatio"] != best.rel_ratio:
+            continue
+        if r["Count"] is not None:
+            total = (total or 0) + r["Count"]
+    _flush()
+    return index
+
+
+def _from_summary(rows):
+    return {
+        (_year_key(r["ModelYear"]), r["Make"], r["Model"]):
+            Vehicle(r["GroupID"], r["Score"], r["Certainty"], r["RelRatio"], r["ComplaintCount"])
+        for r in rows
+    }
+
+@per_db_version
+def get_index() -> dict:
+    with get_conn(readonly=True) as con:
+        # catalogs rewritten by app.tools.optimize_catalog carry the index pre-built
+        if con.execute(queries.HAS_VEHICLE_SUMMARY_SQL).fetchone():
+            return _from_summary(con.execute(queries.VEHICLE_SUMMARY_SQL))
+        return build_index(con.execute(queries.VEHICLES_SQL))
+
+def resolve(year, make, model) -> Optional[Vehicle]:
+    """The canonical row for a Y/M/M, or None if the catalog has no such vehicle."""
+    return get_index().get((year, make, model))
+
+@per_db_version
+def vehicles_by_group() -> dict:
+    """str(GroupID) -> [(year, make, model, Vehicle)], newest year first."""
+    out = {}
+    for (year, make, model), v in get_index().items():
+        if v.group_id is not None:
+            out.setdefault(str(v.group_id), []).append((year, make, model, v))
+    for rows in out.values():
+        rows.sort(key=lambda r: (str(r[0]), r[1] or "", r[2] or ""), reverse=True)
+    return out
@@ -0,0 +1,85 @@
+# Per-year bitsets over make and model ids for /api/filter/makes and
+# /api/filter/models, built once per DB version from CATALOG_SQL.
+#
+# Ids are assigned in the order SQLite's ORDER BY uses (NULL first, then
+# code points), so decoding a bitset low bit first yields the sorted list.
+# A year range is the OR of one int per year; a make filter ORs the per
+# (year, make) model sets instead. Catalogs whose ModelYear is not an
+# integer (un-normalized text years) get None and the SQL path.
+from typing import List, Optional
+from app.db.connection import get_conn, per_db_version
+from app.db import queries
+
+
+def _sort_key(value):
+    return (value is not None, value if value is not None else "")
+
+def _decode(bits: int, names: list) -> list:
+    # bin() is "0b..." with the highest bit first; walk it lowest bit first
+    return [names[i] for i, c in enumerate(reversed(bin(bits)[2:])) if c == "1"]
+
+
+class YearIndex:
+    def __init__(self, rows):
+        self.makes = sorted({r["Make"] for r in rows}, key=_sort_key)
+        self.models = sorted({r["Model"] for r in rows}, key=_sort_key)
+        make_ids = {m: i for i, m in enumerate(self.makes)}
+        model_ids = {m: i for i, m in enumerate(self.models)}
+        self.make_ids = make_ids
+
+        makes_by_year = {}
+        models_by_year = {}
+        models_by_year_make = {}
+        for r in rows:
+            y = r["ModelYear"]
+            mk, md = make_ids[r["Make"]], 1 << model_ids[r["Model"]]
+            makes_by_year[y] = makes_by_year.get(y, 0) | (1 << mk)
+            models_by_year[y] = models_by_year.get(y, 0) | md
+            per_make = models_by_year_make.setdefault(y, {})
+            per_make[mk] = per_make.get(mk, 0) | md
+        self.years = sorted(makes_by_year)
+        self.makes_by_year = makes_by_year
+        self.models_by_year = models_by_year
+        self.models_by_year_make = models_by_year_make
+
+    def _years(self, min_year, max_year):
+        return (y for y in self.years if min_year <= y <= max_year)
+
+    def makes_between(self, min_year, max_year) -> list:
+        bits = 0
+        for y in self._years(min_year, max_year):
+            bits |= self.makes_by_year[y]
+        return _decode(bits, self.makes)
+
+    def models_between(self, min_year, max_year, makes=()) -> list:
+        bits = 0
+        if makes:
+            ids = [self.make_ids[m] for m in makes if m in self.make_ids]
+            for y in self._years(min_year, max_year):
+                per_make = self.models_by_year_make[y]
+                for mk in ids:
+                    bits |= per_make.get(mk, 0)
+        else:
+            for y in self._years(min_year, max_year):
+                bits |= self.models_by_year[y]
+        return _decode(bits, self.models)
+
+
+@per_db_version
+def get_year_index() -> Optional[YearIndex]:
+    with get_conn(readonly=True) as con:
+        rows = con.execute(queries.CATALOG_SQL).fetchall()
+    for r in rows:
+        if type(r["ModelYear"]) is not int:
+            return None
+        if not all(v is None or isinstance(v, str) for v in (r["Make"], r["Model"])):
+            return None
+    return YearIndex(rows)
+
+def makes_between(min_year, max_year) -> Optional[List[str]]:
+    idx = get_year_index()
+    return None if idx is None else idx.makes_between(min_year, max_year)
+
+def models_between(min_year, max_year, makes=()) -> Optional[List[str]]:
+    idx = get_year_index()
+    return None if idx is None else idx.models_between(min_year, max_year, makes)
@@ -0,0 +1 @@
+# Offline command-line tools; run as `python -m app.tools.<name> --help`.
@@ -0,0 +1,164 @@
+"""
+Normalize AllCars so year/make/model lookups are plain index seeks.
+
+Upstream exports have stored ModelYear as padded text, which is why the old
+queries wrapped it in CAST(TRIM(ModelYear) AS INTEGER) and could not use an
+index. This rewrites AllCars with:
+
+  ModelYear  INTEGER (NULL when the old value is not a year)
+  Make/Model trimmed
+  MakeKey    lower-cased, whitespace-collapsed Make  (what /api/grade matches)
+  ModelKey   same for Model
+  Graded     1 when Score and Certainty are both present (what /api/grade serves)
+
+plus the app.db.plans indexes (idx_allcars_keys included), then ANALYZE.
+Running it on an already normalized file is harmless. Optimize afterwards if
+wanted (python -m app.tools.optimize_catalog), then upload.
+
+The source file is never modified. Values the rewrite loses (ModelYear text
+that is not a year, Make/Model with surrounding spaces) are listed before
+anything is written; --dry-run stops after that list.
+
+Usage:
+  python -m app.tools.normalize_catalog GraderRater.db --out GraderRater.norm.db
+  python -m app.tools.normalize_catalog GraderRater.db --dry-run
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+from urllib.parse import quote
+
+from app.db import plans
+from app.services.catalog import name_key
+
+ADDED = ("MakeKey", "ModelKey", "Graded")
+SHOW_VALUES = 20
+
+def clean_year(value):
+    if value is None:
+        return None
+    text = str(value).strip()
+    if re.fullmatch(r"\d{4}(\.0+)?", text):
+        return int(float(text))
+    return None
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _lossy_values(con) -> dict:
+    """{column: [(source value, rows)]} for the values the rewrite changes beyond recovery."""
+    out = {"ModelYear": con.execute(
+        "SELECT ModelYear, COUNT(*) FROM AllCars"
+        " WHERE ModelYear IS NOT NULL AND clean_year(ModelYear) IS NULL"
+        " GROUP BY ModelYear ORDER BY COUNT(*) DESC, ModelYear").fetchall()}
+    for col in ("Make", "Model"):
+        out[col] = con.execute(
+            f"SELECT {col}, COUNT(*) FROM AllCars WHERE {col} <> TRIM({col})"
+            f" GROUP BY {col} ORDER BY COUNT(*) DESC, {col}").fetchall()
+    return out
+
+def _print_lossy(lossy: dict):
+    for col, values in lossy.items():
+        if not values:
+            continue
+        action = "set to NULL" if col == "ModelYear" else "trimmed"
+        print(f"{col}: {sum(n for _, n in values)} rows, {len(values)} distinct values {action}:")
+        for value, n in values[:SHOW_VALUES]:
+            print(f"    {value!r:40} {n} rows")
+        if len(values) > SHOW_VALUES:
+            print(f"    ... {len(values) - SHOW_VALUES} more")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("db", help="source catalog DB")
+    ap.add_argument("--out", help="normalized copy to write")
+    ap.add_argument("--dry-run", action="store_true", help="list the values the rewrite would change, write nothing")
+    args = ap.parse_args(argv)
+    if not args.out and not args.dry_run:
+        ap.error("pass --out (or --dry-run)")
+    if args.out and os.path.abspath(args.db) == os.path.abspath(args.out):
+        ap.error("--out must be a new file")
+
+    src = sqlite3.connect(f"file:{quote(os.path.abspath(args.db))}?mode=ro", uri=True)
+    src.create_function("clean_year", 1, clean_year, deterministic=True)
+    if not src.execute("PRAGMA table_info(AllCars)").fetchall():
+        raise SystemExit("no AllCars table")
+    _print_lossy(_lossy_values(src))
+    if args.dry_run:
+        src.close()
+        return 0
+
+    tmp = args.out + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    dst = sqlite3.connect(tmp)
+    src.backup(dst)
+    src.close()
+
+    con = dst
+    con.create_function("clean_year", 1, clean_year, deterministic=True)
+    con.create_function("name_key", 1, name_key, deterministic=True)
+    cols = [(r[1], r[2]) for r in con.execute("PRAGMA table_info(AllCars)") if r[1] not in ADDED]
+    (before_years,) = con.execute("SELECT COUNT(*) FROM AllCars WHERE ModelYear IS NOT NULL").fetchone()
+
+    defs, exprs = [], []
+    for n, t in cols:
+        if n == "ModelYear":
+            defs.append("ModelYear INTEGER")
+            exprs.append("clean_year(ModelYear)")
+        elif n in ("Make", "Model"):
+            defs.append(f"{n} TEXT")
+            exprs.append(f"TRIM({n})")
+        else:
+            defs.append(f"{_q(n)} {t}")
+            exprs.append(_q(n))
+    names = ", ".join(_q(n) for n, _ in cols)
+
+    # indexes on AllCars are recreated below; other tables are left untouched
+    for (name,) in con.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'AllCars' AND sql IS NOT NULL").fetchall():
+        con.execute(f"DROP INDEX {_q(name)}")
+    con.execute("ALTER TABLE AllCars RENAME TO AllCars_old")
+    con.execute(f"""
+        CREATE TABLE AllCars (
+            {', '.join(defs)},
+            MakeKey  TEXT,
+            ModelKey TEXT,
+            Graded   INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    con.execute(f"""
+        INSERT INTO AllCars ({names}, MakeKey, ModelKey, Graded)
+        SELECT {', '.join(exprs)},
+               name_key(Make), name_key(Model),
+               (Score IS NOT NULL AND Certainty IS NOT NULL)
+        FROM AllCars_old
+        ORDER BY clean_year(ModelYear), TRIM(Make), TRIM(Model)
+    """)
+    con.execute("DROP TABLE AllCars_old")
+    for ddl in plans.all_indexes(con).values():
+        con.execute(ddl)
+    con.commit()
+    con.execute("ANALYZE")
+    con.execute("VACUUM")
+
+    (years,) = con.execute("SELECT COUNT(*) FROM AllCars WHERE ModelYear IS NOT NULL").fetchone()
+    (graded,) = con.execute("SELECT COUNT(*) FROM AllCars WHERE Graded = 1").fetchone()
+    (total,) = con.execute("SELECT COUNT(*) FROM AllCars").fetchone()
+    report = plans.check(con)
+    con.close()
+    os.replace(tmp, args.out)
+
+    print(f"AllCars: {total} rows, {graded} graded; "
+          f"{before_years - years} ModelYear values were not a year and are now NULL")
+    for p in plans.problems(report):
+        print(f"still scanning: {p}", file=sys.stderr)
+    print(f"-> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Rewrite a catalog DB into a read-optimized layout before it is uploaded.
+
+  - AllCars becomes a WITHOUT ROWID table clustered on
+    (ModelYear, Make, Model, RowSeq), RowSeq numbering each vehicle's rows
+    best score first. A lookup or year range reads adjacent pages only.
+  - VehicleSummary holds one pre-aggregated row per vehicle (GroupID, score,
+    ComplaintCount = SUM(Count)); app.services.vehicles loads it instead of
+    aggregating every AllCars row.
+  - The app.db.plans indexes over normalized columns (MakeKey, ModelKey)
+    when the source has them; the clustering covers the rest.
+  - Other tables are copied as they are (except Passes, which the app keeps
+    in PASSES_DB_PATH).
+  - ANALYZE (stat4 when this SQLite has it), the chosen page_size, VACUUM.
+
+Rows without ModelYear, Make or Model are dropped: no query can reach them.
+
+Usage:
+  python -m app.tools.optimize_catalog GraderRater.db --out GraderRater.opt.db
+  --page-size 8192   page size of the output (512..65536, power of two)
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from urllib.parse import quote
+
+from app.db import plans
+from app.services.vehicles import build_index
+
+KEY = ("ModelYear", "Make", "Model")
+SKIP_TABLES = {"AllCars", "VehicleSummary", "Passes", "sqlite_sequence", "sqlite_stat1", "sqlite_stat4"}
+
+
+def _columns(con, table, schema="src"):
+    return [(r[1], r[2]) for r in con.execute(f"PRAGMA {schema}.table_info({table})")]
+
+def _has_stat4(con) -> bool:
+    return any("ENABLE_STAT4" in r[0] for r in con.execute("PRAGMA compile_options"))
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _build_allcars(con):
+    cols = [(n, t) for n, t in _columns(con, "AllCars") if n != "RowSeq"]
+    names = [n for n, _ in cols]
+    missing = [k for k in KEY if k not in names]
+    if missing:
+        raise SystemExit(f"AllCars has no {', '.join(missing)} column")
+    # tie-break equal scores the way the source table returned them
+    source_order = "RowSeq" if any(n == "RowSeq" for n, _ in _columns(con, "AllCars")) else "rowid"
+
+    defs = [f"{_q(n)} {t} NOT NULL" if n in KEY else f"{_q(n)} {t}" for n, t in cols]
+    con.execute(f"""
+        CREATE TABLE AllCars (
+            {', '.join(defs)},
+            RowSeq INTEGER NOT NULL,
+            PRIMARY KEY (ModelYear, Make, Model, RowSeq)
+        ) WITHOUT ROWID
+    """)
+    col_list = ", ".join(_q(n) for n in names)
+    con.execute(f"""
+        INSERT INTO AllCars ({col_list}, RowSeq)
+        SELECT {col_list},
+               ROW_NUMBER() OVER (PARTITION BY ModelYear, Make, Model
+                                  ORDER BY (Score IS NULL), Score DESC, {source_order}) AS RowSeq
+        FROM src.AllCars
+        WHERE ModelYear IS NOT NULL AND Make IS NOT NULL AND Model IS NOT NULL
+        ORDER BY ModelYear, Make, Model, RowSeq
+    """)
+    (kept,) = con.execute("SELECT COUNT(*) FROM AllCars").fetchone()
+    (total,) = con.execute("SELECT COUNT(*) FROM src.AllCars").fetchone()
+    return kept, total - kept
+
+def _build_summary(con):
+    con.execute("""
+        CREATE TABLE VehicleSummary (
+            ModelYear      NOT NULL,
+            Make           TEXT NOT NULL,
+            Model          TEXT NOT NULL,
+            GroupID        INTEGER,
+            Score          REAL,
+            Certainty      REAL,
+            RelRatio       REAL,
+            ComplaintCount INTEGER,
+            PRIMARY KEY (ModelYear, Make, Model)
+        ) WITHOUT ROWID
+    """)
+    cur = con.execute("""
+        SELECT ModelYear, Make, Model, GroupID, Score, Certainty, RelRatio, Count
+        FROM AllCars ORDER BY ModelYear, Make, Model, RowSeq
+    """)
+    cur.row_factory = lambda c, r: {d[0]: v for d, v in zip(c.description, r)}
+    index = build_index(cur)
+    con.executemany(
+        "INSERT INTO VehicleSummary VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(y, mk, md, v.group_id, v.score, v.certainty, v.rel_ratio, v.complaint_count)
+         for (y, mk, md), v in index.items()],
+    )
+    return len(index)
+
+def _copy_other_tables(con):
+    copied = []
+    objs = con.execute(
+        "SELECT type, name, tbl_name, sql FROM src.sqlite_master WHERE sql IS NOT NULL ORDER BY type = 'index'"
+    ).fetchall()
+    for kind, name, table, sql in objs:
+        if table in SKIP_TABLES or table.startswith("sqlite_"):
+            continue
+        con.execute(sql)
+        if kind == "table":
+            con.execute(f"INSERT INTO main.{_q(name)} SELECT * FROM src.{_q(name)}")
+            copied.append(name)
+    return copied
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("db", help="source catalog DB")
+    ap.add_argument("--out", required=True, help="optimized copy to write")
+    ap.add_argument("--page-size", type=int, default=8192)
+    args = ap.parse_args(argv)
+
+    if args.page_size < 512 or args.page_size > 65536 or args.page_size & (args.page_size - 1):
+        ap.error("--page-size must be a power of two between 512 and 65536")
+    if os.path.abspath(args.db) == os.path.abspath(args.out):
+        ap.error("--out must be a new file")
+
+    tmp = args.out + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    con = sqlite3.connect(f"file:{quote(os.path.abspath(tmp))}", uri=True, isolation_level=None)
+    con.execute(f"PRAGMA page_size = {args.page_size}")
+    con.execute("PRAGMA journal_mode = OFF")
+    con.execute("PRAGMA synchronous = OFF")
+    con.execute("ATTACH DATABASE ? AS src", (f"file:{quote(os.path.abspath(args.db))}?mode=ro",))
+
+    con.execute("BEGIN")
+    kept, dropped = _build_allcars(con)
+    for ddl in plans.column_indexes(con).values():
+        con.execute(ddl)
+    vehicles = _build_summary(con)
+    copied = _copy_other_tables(con)
+    con.execute("COMMIT")
+    con.execute("DETACH DATABASE src")
+
+    stat4 = _has_stat4(con)
+    con.execute("ANALYZE")
+    con.execute("VACUUM")
+    report = plans.check(con)
+    con.execute("PRAGMA journal_mode = DELETE")
+    con.close()
+    os.replace(tmp, args.out)
+
+    before, after = os.path.getsize(args.db), os.path.getsize(args.out)
+    print(f"AllCars: {kept} rows ({dropped} without year/make/model dropped); VehicleSummary: {vehicles} rows")
+    if copied:
+        print(f"copied tables: {', '.join(copied)}")
+    print(f"ANALYZE: {'stat4' if stat4 else 'stat1 only (this SQLite has no STAT4)'}; page_size {args.page_size}")
+    print(f"size: {before:,} -> {after:,} bytes")
+    for p in plans.problems(report):
+        print(f"still scanning: {p}", file=sys.stderr)
+    print(f"-> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
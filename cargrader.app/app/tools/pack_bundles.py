@@ -0,0 +1,104 @@
+"""
+Pack each GroupID's artifacts into one ResourceFiles/{gid}/{gid}.bundle.
+
+Usage:
+  # from a local mirror of ResourceFiles/, writing bundles next to the sources
+  python -m app.tools.pack_bundles --src /data/ResourceFiles
+
+  # straight from R2 and back up to R2 (needs the R2_* env vars)
+  python -m app.tools.pack_bundles --from-r2 --upload
+
+  --groups 12,34   only pack these GroupIDs
+  --out DIR        write bundles under DIR/{gid}/ instead of beside the sources
+
+Only the files the loaders read are packed (bundles.is_member); temp files,
+dotfiles and anything else in a group's directory are left out.
+
+After an --upload that wrote at least one bundle, R2_DATA_VERSION_KEY is
+rewritten so running app processes drop remembered misses and revalidate
+cached artifacts (see app.services.r2).
+"""
+import argparse
+import datetime as dt
+import os
+import sys
+from collections import defaultdict
+
+from app.services import bundles
+
+PREFIX = "ResourceFiles/"
+
+
+def _local_groups(src, wanted=None):
+    for gid in sorted(os.listdir(src)):
+        d = os.path.join(src, gid)
+        if wanted is not None and gid not in wanted:
+            continue
+        if not os.path.isdir(d):
+            continue
+        members = {}
+        for name in sorted(os.listdir(d)):
+            path = os.path.join(d, name)
+            if os.path.isfile(path) and bundles.is_member(gid, name):
+                with open(path, "rb") as f:
+                    members[name] = f.read()
+        yield gid, members
+
+def _r2_groups(r2, wanted=None):
+    by_group = defaultdict(list)
+    for key in r2.list_keys(PREFIX):
+        parts = key[len(PREFIX):].split("/", 1)
+        if wanted is not None and parts[0] not in wanted:
+            continue
+        if len(parts) == 2 and bundles.is_member(parts[0], parts[1]):
+            by_group[parts[0]].append(key)
+    for gid in sorted(by_group):
+        yield gid, {k.rsplit("/", 1)[1]: r2.get_bytes(k) for k in by_group[gid]}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--src", help="local directory laid out as {gid}/{files}")
+    src.add_argument("--from-r2", action="store_true", help=f"read {PREFIX} from R2")
+    ap.add_argument("--out", help="write bundles under this directory")
+    ap.add_argument("--upload", action="store_true", help="upload bundles to R2")
+    ap.add_argument("--groups", help="comma-separated GroupIDs to pack")
+    args = ap.parse_args(argv)
+
+    r2 = None
+    if args.from_r2 or args.upload:
+        from app.services import r2
+    if not (args.upload or args.out or args.src):
+        ap.error("nowhere to write: pass --out and/or --upload")
+    wanted = {g.strip() for g in args.groups.split(",")} if args.groups else None
+
+    groups = _local_groups(args.src, wanted) if args.src else _r2_groups(r2, wanted)
+    packed = raw_total = packed_total = 0
+    for gid, members in groups:
+        if not members:
+            continue
+        data = bundles.pack(members)
+        raw_total += sum(len(b) for b in members.values())
+        packed_total += len(data)
+
+        if args.out or args.src:
+            out_dir = os.path.join(args.out or args.src, gid)
+            os.makedirs(out_dir, exist_ok=True)
+            tmp = os.path.join(out_dir, f"{gid}.bundle.tmp")
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, os.path.join(out_dir, f"{gid}.bundle"))
+        if args.upload:
+            r2.put_bytes(bundles.bundle_key(gid), data)
+        packed += 1
+
+    if args.upload and packed and r2.R2_DATA_VERSION_KEY:
+        stamp = dt.datetime.now(dt.timezone.utc).isoformat()
+        r2.put_bytes(r2.R2_DATA_VERSION_KEY, f"{stamp} pack_bundles\n".encode(), content_type="text/plain")
+    print(f"packed {packed} groups: {raw_total:,} bytes -> {packed_total:,} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
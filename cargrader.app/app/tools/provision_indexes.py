@@ -0,0 +1,82 @@
+"""
+Create the AllCars indexes the hot queries need, refresh planner statistics
+and print the resulting query plans (see app.db.plans).
+
+The live catalog is opened immutable by the app and must never be edited in
+place: provision a copy, then publish it through /admin/upload-db. The copy
+goes to --out, by default <db>.indexed.db next to the source; --in-place
+edits db itself and is only for build files no worker has open.
+
+Usage:
+  python -m app.tools.provision_indexes GraderRater.db --out GraderRater.indexed.db
+  python -m app.tools.provision_indexes build/GraderRater.db --in-place
+  --check   only print the plans; exit 1 if a hot query scans AllCars
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from urllib.parse import quote
+
+from app.db import plans
+
+
+def _print_report(report):
+    for name, r in report.items():
+        flag = "FULL SCAN" if r["full_scan"] and not r["bulk"] else "ok"
+        print(f"{name:14} {flag}")
+        for line in r["plan"]:
+            print(f"    {line}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("db", help="catalog DB (SQLite)")
+    target = ap.add_mutually_exclusive_group()
+    target.add_argument("--out", help="indexed copy to write (default: <db>.indexed.db)")
+    target.add_argument("--in-place", action="store_true", help="edit db itself (never the live catalog)")
+    ap.add_argument("--check", action="store_true", help="report plans only")
+    args = ap.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        ap.error(f"no such file: {args.db}")
+    src_uri = f"file:{quote(os.path.abspath(args.db))}?mode=ro"
+
+    if args.check:
+        con = sqlite3.connect(src_uri, uri=True)
+        report = plans.check(con)
+        con.close()
+        _print_report(report)
+        return 1 if plans.problems(report) else 0
+
+    path = args.db
+    if not args.in_place:
+        out = args.out or os.path.splitext(args.db)[0] + ".indexed.db"
+        if os.path.abspath(out) == os.path.abspath(args.db):
+            ap.error("--out must differ from db (or pass --in-place)")
+        src = sqlite3.connect(src_uri, uri=True)
+        dst = sqlite3.connect(out)
+        src.backup(dst)
+        src.close()
+        dst.close()
+        path = out
+
+    con = sqlite3.connect(path)
+    for name, ddl in plans.all_indexes(con).items():
+        print(f"creating {name}")
+        con.execute(ddl)
+    con.execute("ANALYZE")
+    con.commit()
+    report = plans.check(con)
+    con.close()
+
+    _print_report(report)
+    found = plans.problems(report)
+    for p in found:
+        print(f"still scanning: {p}", file=sys.stderr)
+    print(f"-> {path}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Mirror ResourceFiles/ into the local sidecar artifact store.
+
+Every group's top3 / ymmtscount / cby CSVs and llamasum summaries are parsed
+once into typed, pre-sorted tables (see app.services.artifact_store) and the
+source ETags are recorded. Later runs only re-read groups whose objects
+changed. Component names and summaries also go into an FTS5 index for
+/api/complaints/search (a store synced before that index existed is indexed
+in full on the next run). The store is rebuilt in a temp file and swapped in
+atomically, so running app workers pick it up without a restart.
+
+Usage:
+  python -m app.tools.sync_artifacts --out /var/data/artifacts.db            # from R2
+  python -m app.tools.sync_artifacts --out artifacts.db --src ./ResourceFiles  # local mirror
+  --full   ignore the existing store and re-read everything
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import datetime as dt
+from collections import defaultdict
+
+from app.services import artifact_store
+from app.services import artifacts
+
+PREFIX = "ResourceFiles/"
+
+
+def _local_objects(src):
+    out = []
+    for dirpath, _, names in os.walk(src):
+        for n in names:
+            path = os.path.join(dirpath, n)
+            with open(path, "rb") as f:
+                etag = '"%s"' % hashlib.md5(f.read()).hexdigest()
+            rel = os.path.relpath(path, src).replace(os.sep, "/")
+            out.append({"key": PREFIX + rel, "etag": etag, "size": os.path.getsize(path), "path": path})
+    return out
+
+def _group_objects(objects):
+    groups = defaultdict(dict)
+    for o in objects:
+        parts = o["key"][len(PREFIX):].split("/", 1)
+        if len(parts) != 2 or not parts[1] or parts[1].endswith(".bundle"):
+            continue
+        groups[parts[0]][parts[1]] = o
+    return groups
+
+def _parse_group(gid, files, read):
+    def _get(name):
+        return read(files[name]) if name in files else None
+
+    top3 = trims = history = None
+    raw = _get(f"{gid}_top3.csv")
+    if raw is not None:
+        top3 = artifacts.parse_top3(raw)
+        for it in top3:
+            if it["component"]:
+                text = _get(artifacts.summary_filename(it["component"]))
+                if text is not None:
+                    it["summary"] = artifacts.clean_summary(text.decode("utf-8", errors="replace"))
+    raw = _get(f"{gid}_ymmtscount.csv")
+    if raw is not None:
+        trims = artifacts.parse_trims(raw)
+    raw = _get(f"{gid}_cby.csv")
+    if raw is not None:
+        history = artifacts.parse_history(raw)
+    return top3, trims, history
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--out", required=True, help="path of the artifact store (SQLite)")
+    ap.add_argument("--src", help="local ResourceFiles directory instead of R2")
+    ap.add_argument("--full", action="store_true", help="rebuild from scratch")
+    args = ap.parse_args(argv)
+
+    if args.src:
+        objects = _local_objects(args.src)
+
+        def read(o):
+            with open(o["path"], "rb") as f:
+                return f.read()
+    else:
+        from app.services import r2
+        objects = r2.list_objects(PREFIX)
+
+        def read(o):
+            return r2.get_bytes(o["key"])
+
+    tmp = args.out + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    if os.path.exists(args.out) and not args.full:
+        shutil.copyfile(args.out, tmp)
+    con = artifact_store.open_for_write(tmp)
+    if not artifact_store.has_fts(con):
+        print("this SQLite has no FTS5; complaint search will be unavailable", file=sys.stderr)
+    elif artifact_store.needs_reindex(con):
+        print(f"indexed {artifact_store.reindex_complaints(con)} complaints for search")
+
+    old = defaultdict(dict)
+    for key, etag in artifact_store.synced_etags(con).items():
+        old[key[len(PREFIX):].split("/", 1)[0]][key] = etag
+
+    groups = _group_objects(objects)
+    changed = skipped = failed = 0
+    for gid in sorted(groups):
+        files = groups[gid]
+        current = {o["key"]: o["etag"] for o in files.values()}
+        if current == old.get(gid):
+            skipped += 1
+            continue
+        try:
+            top3, trims, history = _parse_group(gid, files, read)
+        except Exception as e:
+            # leave the group out; the app reads it from R2 instead
+            print(f"group {gid}: {e!r}", file=sys.stderr)
+            artifact_store.drop_group(con, gid)
+            failed += 1
+            continue
+        artifact_store.replace_group(con, gid, list(files.values()), top3, trims, history)
+        changed += 1
+
+    removed = [gid for gid in old if gid not in groups]
+    for gid in removed:
+        artifact_store.drop_group(con, gid)
+
+    con.execute("INSERT OR REPLACE INTO meta VALUES ('synced_at', ?)",
+                (dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat(),))
+    con.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (args.src or "r2",))
+    con.commit()
+    con.close()
+    os.replace(tmp, args.out)
+
+    print(f"synced {changed} groups, {skipped} unchanged, {len(removed)} removed, {failed} failed -> {args.out}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
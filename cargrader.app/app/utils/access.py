@@ -1,12 +1,19 @@
 # cargrader.app/app/utils/access.py
 from functools import wraps
-from flask import session, redirect, url_for, request, current_app, jsonify
-from app.db.connection import get_conn
+from flask import session, redirect, url_for, request, current_app, jsonify, g
+from app.db.connection import passes_conn
+from app.utils import cache
 import datetime as dt
+import os
+import sqlite3
+from urllib.parse import quote
+
+_PASS_COLUMNS = "id, user_sub, days, starts_at, expires_at, status, stripe_session_id, stripe_customer_id"
 
 def ensure_pass_tables():
-    """Create the Passes table if it doesn't exist."""
-    with get_conn() as con:
+    """Create the Passes store (WAL) and carry over passes left in the catalog DB."""
+    with passes_conn() as con:
+        con.execute("PRAGMA journal_mode = WAL;")
         con.execute("""
             CREATE TABLE IF NOT EXISTS Passes (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -19,25 +26,78 @@ def ensure_pass_tables():
                 stripe_customer_id TEXT
             )
         """)
-        con.execute("CREATE INDEX IF NOT EXISTS idx_passes_user ON Passes(user_sub)")
+        con.execute("DROP INDEX IF EXISTS idx_passes_user")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_passes_user_status_exp ON Passes(user_sub, status, expires_at)")
+        con.execute("CREATE TABLE IF NOT EXISTS PassesMeta (key TEXT PRIMARY KEY, value TEXT)")
         con.commit()
+        _migrate_from_catalog(con)
+
+def _migrate_from_catalog(con):
+    """One-time copy of the Passes rows that used to live in DB_PATH."""
+    if con.execute("SELECT 1 FROM PassesMeta WHERE key = 'migrated_from_catalog'").fetchone():
+        return
+    catalog = os.path.abspath(current_app.config["DB_PATH"])
+    copied = 0
+    if os.path.exists(catalog) and catalog != os.path.abspath(current_app.config["PASSES_DB_PATH"]):
+        try:
+            src = sqlite3.connect(f"file:{quote(catalog)}?mode=ro", uri=True)
+            try:
+                rows = src.execute(f"SELECT {_PASS_COLUMNS} FROM Passes").fetchall()
+            finally:
+                src.close()
+        except sqlite3.OperationalError:
+            rows = []   # no Passes table in the catalog
+        if rows:
+            before = con.total_changes
+            con.executemany(f"INSERT OR IGNORE INTO Passes ({_PASS_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            copied = con.total_changes - before
+    con.execute("INSERT OR REPLACE INTO PassesMeta VALUES ('migrated_from_catalog', ?)",
+                (f"{_utcnow_iso()} rows={copied}",))
+    con.commit()
+    if copied:
+        current_app.logger.info("copied %d passes from %s into %s", copied, catalog,
+                                current_app.config["PASSES_DB_PATH"])
 
 def _utcnow_iso():
     return dt.datetime.utcnow().replace(microsecond=0).isoformat()
 
-def has_active_pass(user_sub: str) -> bool:
-    now = _utcnow_iso()
-    with get_conn(readonly=True) as con:
+def _pass_cache():
+    cfg = current_app.config
+    return cache.namespace("passes", max_entries=cfg.get("PASS_CACHE_MAX_ENTRIES", 10000),
+                           ttl=cfg.get("PASS_CACHE_TTL", 60), shared=True)
+
+def _query_pass_expiry(user_sub: str) -> str:
+    with passes_conn() as con:
         row = con.execute("""
-            SELECT 1
+            SELECT MAX(expires_at) AS expires_at
             FROM Passes
             WHERE user_sub = :u
               AND status = 'active'
-              AND expires_at >= :now
-            ORDER BY expires_at DESC
-            LIMIT 1
-        """, {"u": user_sub, "now": now}).fetchone()
-    return bool(row)
+        """, {"u": user_sub}).fetchone()
+    return (row and row["expires_at"]) or ""
+
+def pass_expiry(user_sub: str) -> str:
+    """
+    Latest expires_at of the user's active passes ("" if none), memoized for
+    the request in g and for PASS_CACHE_TTL seconds per user_sub.
+    """
+    memo = g.setdefault("pass_expiry", {})
+    if user_sub in memo:
+        return memo[user_sub]
+    passes = _pass_cache()
+    expiry = passes.get(user_sub)
+    if expiry is None:
+        expiry = _query_pass_expiry(user_sub)
+        # no pass yet: recheck sooner, a purchase may land on another worker
+        passes.set(user_sub, expiry, ttl=None if expiry else current_app.config.get("PASS_CACHE_NEGATIVE_TTL", 10))
+    memo[user_sub] = expiry
+    return expiry
+
+def has_active_pass(user_sub: str) -> bool:
+    if not user_sub:
+        return False
+    expiry = pass_expiry(user_sub)
+    return bool(expiry) and expiry >= _utcnow_iso()
 
 def has_active_pass_for_session() -> bool:
     u = session.get("user")
@@ -56,7 +116,7 @@ def active_pass_summary(user_sub: str):
     Returns None if no active pass.
     """
     now = dt.datetime.utcnow()
-    with get_conn(readonly=True) as con:
+    with passes_conn() as con:
         row = con.execute(
             """
             SELECT starts_at, expires_at, days
@@ -86,7 +146,7 @@ def grant_or_extend_pass(user_sub: str, days: int, stripe_session_id: str | None
     now_iso = now.replace(microsecond=0).isoformat()
 
     # If user already has an active pass, extend from current expiry; otherwise start now.
-    with get_conn() as con:
+    with passes_conn() as con:
         r = con.execute("""
             SELECT expires_at
             FROM Passes
@@ -117,6 +177,10 @@ def grant_or_extend_pass(user_sub: str, days: int, stripe_session_id: str | None
         })
         con.commit()
 
+    _pass_cache().set(user_sub, new_expires)
+    if "pass_expiry" in g:
+        g.pass_expiry[user_sub] = new_expires
+
 def requires_pass(view):
     """For routes (esp. API) that require an active pass."""
     @wraps(view)
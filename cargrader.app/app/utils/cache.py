@@ -1,8 +1,384 @@
-# Very simple in-proc cache placeholder
-_cache = {}
+# In-process caches, one per namespace ("catalog", "details", "r2", ...).
+#
+# Each namespace is an LRU bounded by entry count and/or bytes, with an
+# optional TTL. A versioned namespace is tied to data_version() (the catalog
+# DB currently on disk plus bump()), so swapping the DB invalidates all of
+# its entries at once. Values that are bytes/str can also be written to a
+# SQLite file shared by every gunicorn worker; it is consulted after a local
+# miss and also holds the bump() generation, so a bump in one worker
+# invalidates every worker. Configured by init_cache(app) from Config:
+#
+#   CACHE_SHARED_PATH         shared tier file; unset disables the tier
+#   CACHE_SHARED_MAX_ENTRIES  rows kept in the shared tier (oldest pruned first)
+import sys
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+from app.utils import singleflight
 
+_MISSING = object()
+_generation = 0
+
+
+def bump():
+    """
+    Invalidate every versioned namespace, e.g. after new data is published.
+    With the shared tier the generation lives in its file, so other workers
+    see the bump on their next request.
+    """
+    global _generation
+    _generation += 1
+    if _shared is not None:
+        _shared.bump_generation()
+
+def _current_generation() -> int:
+    if _shared is not None:
+        shared = _shared.generation()
+        if shared is not None:
+            return shared
+    return _generation
+
+def data_version():
+    """
+    (generation, catalog DB identity); the DB part is left out outside an app
+    context. Pinned in flask.g like the catalog path, so one request sees one
+    version throughout.
+    """
+    from flask import g, has_app_context
+    if not has_app_context():
+        return (_current_generation(),)
+    version = g.get("data_version")
+    if version is None:
+        from app.db.connection import db_version
+        version = g.data_version = (_current_generation(),) + db_version()
+    return version
+
+def _sizeof(value) -> int:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8", errors="replace"))
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at")
+
+    def __init__(self, value, size, expires_at):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+class Cache:
+    """LRU + TTL cache for one namespace; thread-safe."""
+
+    def __init__(self, name: str, max_entries: Optional[int] = 1024, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None, versioned: bool = False, shared: bool = False,
+                 sizeof: Callable[[Any], int] = _sizeof):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.versioned = versioned
+        self.shared = shared
+        self.sizeof = sizeof
+        self._data: "OrderedDict[Any, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._retired = []       # versions this namespace has moved past, newest last
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0,
+                      "invalidations": 0, "shared_hits": 0}
+
+    def _sync_version_locked(self) -> bool:
+        """False if the caller is on a version this namespace has already moved past."""
+        if not self.versioned:
+            return True
+        version = data_version()
+        if version == self._version:
+            return True
+        if version in self._retired:
+            # a request that started before a swap: bypass rather than flush
+            return False
+        if self._data:
+            self.stats["invalidations"] += 1
+        self._data.clear()
+        self._bytes = 0
+        if self._version is not None:
+            self._retired = (self._retired + [self._version])[-8:]
+        self._version = version
+        return True
+
+    def _drop_locked(self, key):
+        old = self._data.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            if not self._sync_version_locked():
+                self.stats["misses"] += 1
+                return default
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry.expires_at is None or entry.expires_at > now:
+                    self._data.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry.value
+                self._drop_locked(key)
+                self.stats["expired"] += 1
+            version = self._version
+        if self.shared and _shared is not None:
+            value, expires_at = _shared.get(self.name, key, version, now)
+            if value is not _MISSING:
+                self.stats["shared_hits"] += 1
+                # keep it locally no longer than the shared row or this namespace's ttl
+                ttls = [t for t in (None if expires_at is None else expires_at - now, self.ttl) if t is not None]
+                self._put_local(key, value, min(ttls) if ttls else None)
+                return value
+        self.stats["misses"] += 1
+        return default
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        if self._put_local(key, value, ttl) and self.shared and _shared is not None \
+                and isinstance(value, (bytes, str)):
+            _shared.put(self.name, key, self._version, value, ttl)
+
+    def _put_local(self, key, value, ttl):
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return False
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            if not self._sync_version_locked():
+                return False
+            self._drop_locked(key)
+            self._data[key] = _Entry(value, size, expires_at)
+            self._bytes += size
+            while self._data and (
+                (self.max_entries is not None and len(self._data) > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted.size
+                self.stats["evictions"] += 1
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._drop_locked(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def info(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["shared_hits"] + self.stats["misses"]
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "versioned": self.versioned,
+                "shared": self.shared and _shared is not None,
+                "hit_rate": round((self.stats["hits"] + self.stats["shared_hits"]) / lookups, 4) if lookups else None,
+                **self.stats,
+            }
+
+
+class SharedTier:
+    """bytes/str values in a SQLite file that every worker on the host can read."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        ns         TEXT NOT NULL,
+        key        TEXT NOT NULL,
+        version    TEXT NOT NULL,
+        expires_at REAL,
+        is_text    INTEGER NOT NULL,
+        value      BLOB NOT NULL,
+        stored_at  REAL NOT NULL,
+        PRIMARY KEY (ns, key)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS meta (
+        key   TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    """
+    PRUNE_EVERY = 500
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self.stats = {"errors": 0}
+        con = self._con()
+        con.executescript(self.SCHEMA)
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def get(self, ns, key, version, now):
+        try:
+            row = self._con().execute(
+                "SELECT version, expires_at, is_text, value FROM entries WHERE ns = ? AND key = ?",
+                (ns, repr(key)),
+            ).fetchone()
+        except sqlite3.Error:
+            self.stats["errors"] += 1
+            return _MISSING, None
+        if row is None or row[0] != repr(version) or (row[1] is not None and row[1] <= now):
+            return _MISSING, None
+        return (row[3].decode("utf-8") if row[2] else bytes(row[3])), row[1]
+
+    def put(self, ns, key, version, value, ttl):
+        now = time.time()
+        is_text = isinstance(value, str)
+        blob = value.encode("utf-8") if is_text else value
+        try:
+            con = self._con()
+            con.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ns, repr(key), repr(version), now + ttl if ttl is not None else None, is_text, blob, now),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self.prune(now)
+        except sqlite3.Error:
+            self.stats["errors"] += 1
+
+    def generation(self) -> Optional[int]:
+        """The bump() generation shared by every worker; None if the file cannot be read."""
+        try:
+            row = self._con().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        except sqlite3.Error:
+            self.stats["errors"] += 1
+            return None
+        return row[0] if row else 0
+
+    def bump_generation(self):
+        try:
+            self._con().execute(
+                "INSERT INTO meta VALUES ('generation', 1)"
+                " ON CONFLICT(key) DO UPDATE SET value = value + 1"
+            )
+        except sqlite3.Error:
+            self.stats["errors"] += 1
+
+    def prune(self, now=None):
+        now = now or time.time()
+        con = self._con()
+        con.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        con.execute(
+            "DELETE FROM entries WHERE (ns, key) IN ("
+            " SELECT ns, key FROM entries ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def info(self) -> dict:
+        try:
+            (n,) = self._con().execute("SELECT COUNT(*) FROM entries").fetchone()
+        except sqlite3.Error:
+            n = None
+        return {"path": self.path, "entries": n, "max_entries": self.max_entries, **self.stats}
+
+
+_shared: Optional[SharedTier] = None
+
+def init_cache(app):
+    """Open the shared tier named by app.config (CACHE_SHARED_PATH), if any."""
+    global _shared
+    path = app.config.get("CACHE_SHARED_PATH")
+    if not path:
+        _shared = None
+        return
+    if _shared is not None and _shared.path == path:
+        return
+    try:
+        _shared = SharedTier(path, app.config.get("CACHE_SHARED_MAX_ENTRIES", 50000))
+    except sqlite3.Error:
+        app.logger.exception("shared cache tier %s unavailable", path)
+        _shared = None
+
+_namespaces: Dict[str, Cache] = {}
+_namespaces_lock = threading.Lock()
+
+def namespace(name: str, **options) -> Cache:
+    """The process-wide Cache for name, created with options on first use."""
+    c = _namespaces.get(name)
+    if c is None:
+        with _namespaces_lock:
+            c = _namespaces.get(name)
+            if c is None:
+                c = _namespaces[name] = Cache(name, **options)
+    return c
+
+def stats() -> dict:
+    with _namespaces_lock:
+        caches = list(_namespaces.values())
+    out = {"namespaces": {c.name: c.info() for c in caches}, "data_version": repr(data_version())}
+    if _shared is not None:
+        out["shared"] = _shared.info()
+    return out
+
+def clear_all():
+    with _namespaces_lock:
+        caches = list(_namespaces.values())
+    for c in caches:
+        c.clear()
+
+
+_flights = singleflight.group("cache")
+
+def memoize(ns: str, ttl: Optional[float] = None, versioned: bool = True, **options):
+    """
+    Cache fn(*args) in namespace ns. Arguments must be hashable. None results
+    are cached too. Concurrent misses on the same arguments run fn once.
+    fn.cache is the namespace; fn.invalidate() clears it.
+    """
+    def decorate(fn):
+        c = namespace(ns, ttl=ttl, versioned=versioned, **options)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (fn.__qualname__, args, tuple(sorted(kwargs.items()))) if kwargs else (fn.__qualname__, args)
+            value = c.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+            def load():
+                value = fn(*args, **kwargs)
+                c.set(key, value)
+                return value
+            # callers pinned to different data versions must not share a load
+            version = data_version() if versioned else None
+            return _flights.do((ns, key, version), load)
+
+        wrapper.cache = c
+        wrapper.invalidate = c.clear
+        return wrapper
+    return decorate
+
+
+# The original get/set API, on a small unversioned namespace.
 def get(key):
-    return _cache.get(key)
+    return namespace("default").get(key)
 
 def set(key, value):
-    _cache[key] = value
+    namespace("default").set(key, value)
@@ -0,0 +1,77 @@
+# Request coalescing: concurrent callers asking for the same key share one
+# in-flight call instead of each hitting R2 / SQLite. The first caller runs
+# the function; the others block until it finishes and get the same result,
+# or the same exception. Nothing is cached once the call completes.
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class Group:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.stats = {"calls": 0, "shared": 0, "errors": 0}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs):
+        """fn(*args, **kwargs), unless a call for key is already running; then wait for it."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats["shared"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.stats["calls"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            self.stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def info(self) -> dict:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {"in_flight": in_flight, **self.stats}
+
+
+_groups: Dict[str, Group] = {}
+_groups_lock = threading.Lock()
+
+def group(name: str) -> Group:
+    """The process-wide Group for name ("r2", "db", ...)."""
+    g = _groups.get(name)
+    if g is None:
+        with _groups_lock:
+            g = _groups.setdefault(name, Group(name))
+    return g
+
+def stats() -> Dict[str, dict]:
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {g.name: g.info() for g in groups}
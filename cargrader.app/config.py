@@ -4,4 +4,60 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret")
     DB_PATH = os.environ.get("DB_PATH") or "/var/data/GraderRater.db"
 
+    # Read-only connection pool for the catalog DB (app.db.connection.ReadPool)
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+    DB_MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+    DB_CACHE_SIZE_KB = int(os.environ.get("DB_CACHE_SIZE_KB", str(32 * 1024)))
+    # The catalog is only ever replaced as a whole file (new inode), never edited
+    # in place, so readers can open it with immutable=1 and skip file locking
+    DB_IMMUTABLE = os.environ.get("DB_IMMUTABLE", "1") == "1"
 
+    # Passes live in their own WAL-mode file so catalog swaps never touch them
+    PASSES_DB_PATH = os.environ.get("PASSES_DB_PATH") or os.path.join(
+        os.path.dirname(DB_PATH), "passes.db")
+
+    # Worker threads for concurrent R2 artifact reads (/api/vehicle)
+    ARTIFACT_FETCH_WORKERS = int(os.environ.get("ARTIFACT_FETCH_WORKERS", "8"))
+
+    # Per-component *_llamasum.txt reads in /api/top-complaints
+    SUMMARY_FETCH_WORKERS = int(os.environ.get("SUMMARY_FETCH_WORKERS", "16"))
+    SUMMARY_FETCH_DEADLINE = float(os.environ.get("SUMMARY_FETCH_DEADLINE", "3.0"))
+
+    # Pre-parsed local copy of ResourceFiles/ (python -m app.tools.sync_artifacts);
+    # ignored until the file exists
+    ARTIFACT_STORE_PATH = os.environ.get("ARTIFACT_STORE_PATH") or os.path.join(
+        os.path.dirname(DB_PATH), "artifacts.db")
+
+    # Bearer token for the /admin endpoints; they answer 404 while it is unset
+    UPLOAD_TOKEN = os.environ.get("UPLOAD_TOKEN")
+
+    # Active-pass checks: per request in flask.g, then per user_sub for this long
+    PASS_CACHE_TTL = float(os.environ.get("PASS_CACHE_TTL", "60"))
+    PASS_CACHE_NEGATIVE_TTL = float(os.environ.get("PASS_CACHE_NEGATIVE_TTL", "10"))
+    PASS_CACHE_MAX_ENTRIES = int(os.environ.get("PASS_CACHE_MAX_ENTRIES", "10000"))
+
+    # Catalog uploads (/admin/upload-db): published under CATALOG_VERSIONS_DIR
+    # (default: versions/ next to DB_PATH), newest CATALOG_KEEP_VERSIONS kept;
+    # an older one is deleted once CATALOG_PRUNE_GRACE seconds have passed
+    # since it was replaced
+    CATALOG_VERSIONS_DIR = os.environ.get("CATALOG_VERSIONS_DIR")
+    CATALOG_KEEP_VERSIONS = int(os.environ.get("CATALOG_KEEP_VERSIONS", "3"))
+    CATALOG_PRUNE_GRACE = float(os.environ.get("CATALOG_PRUNE_GRACE", "600"))
+    CATALOG_INTEGRITY_CHECK = os.environ.get("CATALOG_INTEGRITY_CHECK", "1") == "1"
+
+    # Full table scans in the hot query plans (app.db.plans): warn | reject | off
+    QUERY_PLAN_POLICY = os.environ.get("QUERY_PLAN_POLICY", "warn").lower()
+
+    # Columnar AllCars snapshot for /api/filter/search (needs numpy)
+    FILTER_SNAPSHOT = os.environ.get("FILTER_SNAPSHOT", "1") == "1"
+    FILTER_SEARCH_MAX_LIMIT = int(os.environ.get("FILTER_SEARCH_MAX_LIMIT", "1000"))
+
+    # Width of the score buckets returned by /api/filter/facets
+    FILTER_FACET_BUCKET = float(os.environ.get("FILTER_FACET_BUCKET", "10"))
+
+    # POST /api/grade/bulk: most vehicles accepted in one request
+    BULK_GRADE_MAX_ITEMS = int(os.environ.get("BULK_GRADE_MAX_ITEMS", "50000"))
+
+    # Cross-worker cache tier (app.utils.cache); unset keeps caches per process
+    CACHE_SHARED_PATH = os.environ.get("CACHE_SHARED_PATH")
+    CACHE_SHARED_MAX_ENTRIES = int(os.environ.get("CACHE_SHARED_MAX_ENTRIES", "50000"))
@@ -277,10 +277,20 @@ btn.addEventListener('click', async () => {
   const y = yearSel.value, make = makeSel.value, model = modelSel.value;
   if (!(y && make && model)) return;
 
+  // Whole vehicle bundle in one round trip; gated sections are absent without a pass
+  let bundle = null;
+  try {
+    bundle = await getJSON(`/api/vehicle?year=${y}&make=${encodeURIComponent(make)}&model=${encodeURIComponent(model)}`);
+  } catch (_) {}
+  const section = (name) => {
+    if (!bundle || bundle[name] == null) throw new Error(`No ${name} section`);
+    return bundle[name];
+  };
+
   // 1) Canonical score
   let score = null, certainty = null, groupId = null;
   try {
-    const sc = await getJSON(`/api/score?year=${y}&make=${encodeURIComponent(make)}&model=${encodeURIComponent(model)}`);
+    const sc = section('score');
     score = (sc && sc.score != null) ? Number(sc.score) : null;
     certainty = (sc && sc.certainty != null) ? Number(sc.certainty) : null;
     groupId = sc && sc.group_id != null ? sc.group_id : null;
@@ -323,7 +333,7 @@ btn.addEventListener('click', async () => {
 
   // 2) Details (two-line write-up)
   try {
-    const d = await getJSON(`/api/details?year=${y}&make=${encodeURIComponent(make)}&model=${encodeURIComponent(model)}`);
+    const d = section('details');
     const modelYear = d.ModelYear ?? d.year ?? y;
     const makeName  = d.Make      ?? d.make ?? make;
     const modelName = d.Model     ?? d.model ?? model;
@@ -344,7 +354,7 @@ btn.addEventListener('click', async () => {
 
   // 3) Top complaints
   try {
-    const top = await getJSON(`/api/top-complaints?year=${y}&make=${encodeURIComponent(make)}&model=${encodeURIComponent(model)}`);
+    const top = section('top_complaints');
     const items = (top.items || []).slice(0, 8);
     const html = items.map(it => {
       const comp = it.component || 'Unknown';
@@ -362,7 +372,7 @@ btn.addEventListener('click', async () => {
 
   // 4) Trims
   try {
-    const tr = await getJSON(`/api/trims?year=${y}&make=${encodeURIComponent(make)}&model=${encodeURIComponent(model)}`);
+    const tr = section('trims');
     const items = (tr.items || []).sort((a, b) => (b.count || 0) - (a.count || 0));
     const tbody = document.getElementById('trimsTbody');
     if (!tbody) throw new Error('Missing #trimsTbody');
@@ -382,7 +392,7 @@ btn.addEventListener('click', async () => {
 
   // 5) History
   try {
-    const hist = await getJSON(`/api/history?year=${y}&make=${encodeURIComponent(make)}&model=${encodeURIComponent(model)}`);
+    const hist = section('history');
     const items = hist.items || [];
     const note = document.getElementById('historyNote');
     if (note) { if (hist.note) { note.textContent = hist.note; note.style.display='inline-block'; } else { note.style.display='none'; } }